@@ -1,42 +1,78 @@
 # api.py
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict
-import json, os, random
+from typing import Any, List, Dict, NamedTuple, Optional, Set, Tuple
+import os, random, time
 
-import re
+from catalog import ExerciseCatalog, canonical_skill
+from catalog_bin import artifact_path, load_shared
+from catalog_watch import CatalogWatcher
+from plan_cache import PlanCache, fingerprint
+from sampling import gumbel_top_k
 
-def norm_basic(s: str) -> str:
-    return (s or "").strip().lower()
+# ---- import your deterministic helpers ----
+# Make sure the filename below exists next to api.py
+from deterministic import (
+    rank_candidates, score_candidates, choose_dose, norm
+)
 
-# Minimal alias map – add more as you standardize names
-ALIASES = {
-    "hollow body hold": "hollow hold",
-    "arch body hold": "arch hold",
-    "pull-up": "pull up",
-    "chin-up": "chin up",
-}
+# Optional NumPy scorer (same ranking as rank_candidates, one mat-vec per request)
+try:
+    from vectorized import VectorScorer
+    _numpy_available = True
+except Exception:
+    _numpy_available = False
 
-def canonical_skill(s: str) -> str:
-    t = norm_basic(s)
-    # normalize punctuation/hyphens/whitespace
-    t = re.sub(r"[^a-z0-9]+", " ", t).strip()
-    # alias collapse
-    return ALIASES.get(t, t)
+# "python" (default) or "numpy"
+SCORER = os.getenv("PLAN_SCORER", "python")
 
+# /plan/batch: larger POSTs get a 413; scored this many requests at a time, so a batch
+# holds at most BATCH_CHUNK x catalog-size floats instead of one row per request
+BATCH_MAX = int(os.getenv("PLAN_BATCH_MAX", "256"))
+BATCH_CHUNK = int(os.getenv("PLAN_BATCH_CHUNK", "32"))
 
-# ---- import your deterministic helpers ----
-# Make sure the filename below exists next to api.py
-from deterministic import (
-    rank_candidates, choose_dose, norm
+# ---- catalog (hot-reloaded) ----
+EX_PATH = os.getenv("EXERCISES_PATH") or os.path.join(os.path.dirname(__file__), "/Users/celestevandokkum/prog_projects/Calicraft/Swift App/New Project/Data/exercises.json")
+# seconds between checks of EX_PATH for edits; 0 turns hot reload off
+RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_SECONDS", "2"))
+# where the compiled catalog is written (never next to EX_PATH, which the iOS app bundles);
+# unset = the user cache dir, see catalog_bin.artifact_dir
+ARTIFACT_DIR = os.getenv("CATALOG_ARTIFACT_DIR")
+# rows each worker keeps built from the mapped catalog; unset = all it has touched
+CACHE_ROWS = int(os.environ["CATALOG_CACHE_ROWS"]) if os.getenv("CATALOG_CACHE_ROWS") else None
+
+class Snapshot(NamedTuple):
+    """Everything derived from one version of exercises.json; requests read it once."""
+    catalog: ExerciseCatalog
+    scorer: Optional[Any]   # VectorScorer when numpy is there
+
+def build_snapshot(path: str) -> Snapshot:
+    # Compiled into ARTIFACT_DIR on first start (one worker compiles, the rest wait) and
+    # memory-mapped read-only, so `uvicorn api:app --workers N` shares one copy of the
+    # catalog and its indexes through the page cache instead of N private ones.
+    catalog = load_shared(path, artifact=artifact_path(path, ARTIFACT_DIR), cache_rows=CACHE_ROWS)
+    # always built when numpy is there: /plan/batch needs it, /plan only if SCORER == "numpy"
+    scorer = VectorScorer.from_catalog(catalog) if _numpy_available else None
+    return Snapshot(catalog, scorer)
+
+CATALOG_WATCHER = CatalogWatcher(EX_PATH, build_snapshot, interval=RELOAD_INTERVAL)
+
+# ---- response cache (seeded requests only) ----
+PLAN_CACHE = PlanCache(
+    maxsize=int(os.getenv("PLAN_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("PLAN_CACHE_TTL", "600")),
 )
+PLAN_CACHE.set_catalog(CATALOG_WATCHER.current.catalog.content_hash)
+CATALOG_WATCHER.on_swap(lambda old, new: PLAN_CACHE.set_catalog(new.catalog.content_hash))
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    CATALOG_WATCHER.start()
+    yield
+    CATALOG_WATCHER.stop()
 
-# ---- load exercises once ----
-EX_PATH = os.path.join(os.path.dirname(__file__), "/Users/celestevandokkum/prog_projects/Calicraft/Swift App/New Project/Data/exercises.json")
-with open(EX_PATH, "r", encoding="utf-8") as f:
-    EXERCISES = json.load(f)
+app = FastAPI(lifespan=lifespan)
 
 # ---- Swift DTO mirrors ----
 class PlanRequestDTO(BaseModel):
@@ -49,6 +85,10 @@ class PlanRequestDTO(BaseModel):
     use_llm: bool = False
     goal: str | None = None
     session_minutes: int | None = None
+    seed: int | None = None  # same request + seed -> byte-identical plan; None = fresh randomness
+    # None: shuffle of the best 2N. Else score-weighted draw over the whole pool,
+    # P ∝ exp(score / temperature): lower = closer to the best N, higher = more variety
+    temperature: float | None = None
 
 class PlanExerciseDTO(BaseModel):
     name: str
@@ -69,68 +109,101 @@ def infer_band(lo: int, hi: int) -> str:
     if c <= 8: return "advanced"
     return "elite"
 
-def overlaps_targets(ex: dict, targets: set[str]) -> bool:
-    m = ex.get("muscles", {})
-    bag = {norm(x) for x in (m.get("primary", []) + m.get("secondary", []) + m.get("tertiary", []))}
-    return not targets.isdisjoint(bag)
 
-def prereqs_ok(ex: dict, unlocked: set[str]) -> bool:
-    u = {canonical_skill(x) for x in unlocked}
-    req = {canonical_skill(x) for x in ex.get("requiredSkills", [])}
-    return req.issubset(u)
+# Your ranker needs equipment flags; we’ll allow all since the Swift request doesn’t send equipment.
+EQUIPMENT_FLAGS: Dict[str, bool] = {}
 
-
-@app.post("/plan", response_model=PlanResponseDTO)
-def plan(req: PlanRequestDTO):
+def eligible(req: PlanRequestDTO, catalog: ExerciseCatalog) -> Tuple[Set[str], str, List[int]]:
+    """(normalized targets, band, catalog ids passing difficulty/targets/prereqs)."""
     targets = {norm(m) for m in req.target_muscles}
-    unlocked = {norm(s) for s in req.user_skills}
+    unlocked = catalog.skills.unlocked_mask(req.user_skills)
     band = infer_band(req.min_difficulty, req.max_difficulty)
 
     # Filter by difficulty, targets, and prerequisites (if gating enabled)
-    pool = []
-    for ex in EXERCISES:
-        d = int(ex.get("difficulty", 5))
-        if not (req.min_difficulty <= d <= req.max_difficulty):
-            continue
-        if targets and not overlaps_targets(ex, targets):
-            continue
-        if req.gate_by_skills and not prereqs_ok(ex, unlocked):
-            continue
-        pool.append(ex)
-
-    if not pool:
-        return PlanResponseDTO(plan=[], focus_scores={}, notes=["No eligible exercises (filters/prereqs)"])
-
-    # Your ranker needs equipment flags; we’ll allow all since the Swift request doesn’t send equipment.
-    equipment_flags: Dict[str, bool] = {}
-
-    # Rank + take top 2N for variety + sample N
-    scored = rank_candidates(pool, list(targets), band, equipment_flags, rand=0.2)
-    k = min(max(2 * req.number_of_exercises, req.number_of_exercises), len(scored))
-    candidates = [e for (e, s) in scored[:k]]
-    random.shuffle(candidates)
-    chosen = candidates[:req.number_of_exercises]
+    ids = catalog.filter(
+        req.min_difficulty, req.max_difficulty, targets,
+        unlocked if req.gate_by_skills else None,
+    )
+    return targets, band, ids
+
+def cache_key(req: PlanRequestDTO) -> str | None:
+    """
+    Fingerprint of everything that affects a seeded plan, or None if unseeded.
+    Targets and skills are normalized and sorted so ["Lats", "biceps"] and
+    ["Biceps", "lats "] share an entry; skills only count when gating is on.
+    """
+    if req.seed is None:
+        return None
+    fields = req.model_dump(exclude={"target_muscles", "user_skills", "use_llm"})
+    fields["target_muscles"] = sorted({norm(m) for m in req.target_muscles})
+    fields["user_skills"] = sorted({canonical_skill(s) for s in req.user_skills}) if req.gate_by_skills else []
+    return fingerprint(fields)
+
+def top_k_for(req: PlanRequestDTO) -> int:
+    # the plan samples N out of the best 2N, so rankers never need to sort past that
+    return max(2 * req.number_of_exercises, req.number_of_exercises, 0)
+
+def score_pool(
+    req: PlanRequestDTO,
+    catalog: ExerciseCatalog,
+    scorer: Optional[Any],
+    targets: Set[str],
+    band: str,
+    ids: List[int],
+    rng: random.Random,
+    base: Optional[Any] = None,
+) -> List[Tuple[dict, float]]:
+    """
+    (exercise, score) for the eligible ids: the jittered best 2N, best first, or with
+    a temperature the raw scores of the whole pool, unsorted, for the sampler.
+    `base` is this request's row of a base_scores_batch (numpy only).
+    """
+    k = top_k_for(req)
+    if base is None and SCORER == "numpy" and scorer is not None:
+        base = scorer.base_scores(targets, band)
+    if base is not None:
+        if req.temperature is not None:
+            return scorer.candidates_from(base, EQUIPMENT_FLAGS, ids=ids)
+        return scorer.rank_from(base, EQUIPMENT_FLAGS, rand=0.2, ids=ids, rng=rng, k=k)
+    exercises = [catalog.exercises[i] for i in ids]
+    if req.temperature is not None:
+        return score_candidates(exercises, list(targets), band, EQUIPMENT_FLAGS)
+    return rank_candidates(exercises, list(targets), band, EQUIPMENT_FLAGS, rand=0.2, rng=rng, k=k)
+
+def no_pool_response() -> PlanResponseDTO:
+    return PlanResponseDTO(plan=[], focus_scores={}, notes=["No eligible exercises (filters/prereqs)"])
+
+def build_response(
+    req: PlanRequestDTO,
+    catalog: ExerciseCatalog,
+    targets: Set[str],
+    band: str,
+    scored: List[Tuple[dict, float]],
+    rng: random.Random,
+) -> PlanResponseDTO:
+    if req.temperature is not None:
+        # one Gumbel-top-k pass over the unsorted pool (see sampling)
+        chosen = gumbel_top_k(scored, req.number_of_exercises, req.temperature, rng)
+    else:
+        # take top 2N for variety + sample N
+        k = min(top_k_for(req), len(scored))
+        candidates = [e for (e, s) in scored[:k]]
+        rng.shuffle(candidates)
+        chosen = candidates[:req.number_of_exercises]
 
     # Build flat "plan" list and compute focus scores
     out_plan: List[PlanExerciseDTO] = []
-    focus: Dict[str, int] = {}
     for ex in chosen:
         d = int(ex.get("difficulty", 5))
-        dose = choose_dose(ex, band, rand=0.2)  # your deterministic dose chooser
+        dose = choose_dose(ex, band, rand=0.2, rng=rng)  # your deterministic dose chooser
         out_plan.append(PlanExerciseDTO(
             name=ex["name"],
             description=ex.get("description", ""),
             difficulty=d,
-            reps=dose
+            reps=str(dose)
         ))
-        # tally focus on targets for UI summary
-        m = ex.get("muscles", {})
-        for x in m.get("primary", []):
-            if norm(x) in targets: focus[x] = focus.get(x, 0) + 3
-        for x in m.get("secondary", []):
-            if norm(x) in targets: focus[x] = focus.get(x, 0) + 2
-        for x in m.get("tertiary", []):
-            if norm(x) in targets: focus[x] = focus.get(x, 0) + 1
+    # tally focus on targets for UI summary
+    focus = catalog.focus_scores((catalog.index(ex) for ex in chosen), targets)
 
     notes = []
     if req.goal: notes.append(f"Goal: {req.goal}")
@@ -139,10 +212,99 @@ def plan(req: PlanRequestDTO):
     return PlanResponseDTO(plan=out_plan, focus_scores=focus, notes=notes)
 
 
+@app.post("/plan", response_model=PlanResponseDTO)
+def plan(req: PlanRequestDTO):
+    # one snapshot for the whole request, even if a reload swaps in a new one meanwhile
+    catalog, scorer = CATALOG_WATCHER.current
+    key = cache_key(req)
+    if key is not None:
+        cached = PLAN_CACHE.get(key, catalog.content_hash)
+        if cached is not None:
+            return cached
+
+    # one RNG per request: FastAPI runs this on a threadpool, so the global one would
+    # be shared (and interleaved) across concurrent requests
+    rng = random.Random(req.seed)
+    targets, band, ids = eligible(req, catalog)
+    if not ids:
+        resp = no_pool_response()
+    else:
+        scored = score_pool(req, catalog, scorer, targets, band, ids, rng)
+        resp = build_response(req, catalog, targets, band, scored, rng)
+
+    if key is not None:
+        PLAN_CACHE.put(key, catalog.content_hash, resp)
+    return resp
+
+
+@app.post("/plan/batch", response_model=List[PlanResponseDTO])
+def plan_batch(reqs: List[PlanRequestDTO]):
+    """
+    Many plans in one round-trip (at most PLAN_BATCH_MAX). With numpy, requests are
+    scored BATCH_CHUNK at a time, each chunk in one (requests × exercises) matrix
+    product; each request then filters, jitters and samples with its own
+    random.Random(seed). Responses come back in request order.
+    """
+    if len(reqs) > BATCH_MAX:
+        raise HTTPException(413, f"at most {BATCH_MAX} requests per batch, got {len(reqs)}")
+    catalog, scorer = CATALOG_WATCHER.current
+    keys = [cache_key(r) for r in reqs]
+    out: List[PlanResponseDTO | None] = [
+        PLAN_CACHE.get(k, catalog.content_hash) if k is not None else None for k in keys
+    ]
+    todo = [j for j, resp in enumerate(out) if resp is None]
+    for start in range(0, len(todo), BATCH_CHUNK):
+        chunk = todo[start:start + BATCH_CHUNK]
+        prepared = {j: eligible(reqs[j], catalog) for j in chunk}
+        base = None
+        if scorer is not None:
+            base = scorer.base_scores_batch([prepared[j][0] for j in chunk], [prepared[j][1] for j in chunk])
+
+        for row, j in enumerate(chunk):
+            req = reqs[j]
+            targets, band, ids = prepared[j]
+            if not ids:
+                out[j] = no_pool_response()
+            else:
+                rng = random.Random(req.seed)
+                scored = score_pool(req, catalog, scorer, targets, band, ids, rng,
+                                    base=None if base is None else base[row])
+                out[j] = build_response(req, catalog, targets, band, scored, rng)
+            if keys[j] is not None:
+                PLAN_CACHE.put(keys[j], catalog.content_hash, out[j])
+    return out
+
+
+@app.get("/plan/cache")
+def plan_cache_stats():
+    """Hit/miss counters and size of the seeded-plan cache."""
+    return PLAN_CACHE.stats()
+
+
+@app.get("/catalog")
+def catalog_info():
+    """
+    Which exercises.json this worker is serving. content_hash changes iff the data
+    does, so clients can key their own caches on it.
+    """
+    w = CATALOG_WATCHER
+    catalog = w.current.catalog
+    return {
+        "path": w.path,
+        "content_hash": catalog.content_hash,
+        "exercises": len(catalog),
+        "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(w.loaded_at)),
+        "reloads": w.reloads,
+        "reload_interval_seconds": w.interval,
+        "last_error": w.last_error,
+    }
+
+
 # cd ~/swift_cali_ai/prog_projects/other
 # python3 -m venv .venv
 # source .venv/bin/activate
 # pip install fastapi uvicorn "pydantic>=2,<3"
+# pip install numpy   # optional, for PLAN_SCORER=numpy
 
 # simulator
 # uvicorn api:app --reload --host 127.0.0.1 --port 8000
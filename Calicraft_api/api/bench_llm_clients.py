@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Per-request connection overhead: a fresh HTTP client per LLM call vs one pooled,
+kept-alive client, against a local fake Ollama / OpenAI server.
+
+  python bench_llm_clients.py --calls 200
+  python bench_llm_clients.py --calls 200 --handshake-ms 20   # pretend each new connection costs a TLS handshake
+
+The fake server answers /api/generate (Ollama) and /v1/chat/completions (OpenAI)
+instantly and counts the TCP connections it accepted, so "connections" below is
+exact; --handshake-ms sleeps once per new connection to stand in for the
+network round trips + TLS a real remote API costs.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+
+import requests
+
+from ollama_workout_planner import OllamaClient
+
+try:
+    from openai import OpenAI
+    _openai_available = True
+except Exception:
+    _openai_available = False
+
+PLAN = json.dumps({"plan": [{"name": "Push Up", "prescription": "3x10", "block": "strength"}]})
+
+
+class FakeLLM(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive unless the client closes
+    disable_nagle_algorithm = True  # else headers + body as two writes stall on delayed ACKs (~40 ms)
+    handshake = 0.0
+    connections = 0
+    _lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with FakeLLM._lock:
+            FakeLLM.connections += 1
+        if self.handshake:
+            time.sleep(self.handshake)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/api/generate"):
+            body = {"model": "fake", "response": PLAN, "done": True}
+        elif self.path.endswith("/chat/completions"):
+            body = {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": "fake",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": PLAN}}],
+            }
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(label: str, call: Callable[[], None], calls: int) -> Dict[str, float]:
+    call()   # warm-up (imports, first connection) outside the timing
+    before = FakeLLM.connections
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        call()
+    ms = (time.perf_counter() - t0) * 1e3 / calls
+    conns = FakeLLM.connections - before
+    print(f"  {label:<34} {ms:8.3f} ms/call   {conns:5d} connections")
+    return {"ms": ms, "connections": conns}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--calls", type=int, default=200)
+    ap.add_argument("--handshake-ms", type=float, default=0.0)
+    args = ap.parse_args()
+
+    FakeLLM.handshake = args.handshake_ms / 1e3
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeLLM)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    payload = {"model": "fake", "prompt": "plan", "stream": False, "options": {"temperature": 0.4}}
+
+    print(f"{args.calls} calls, handshake {args.handshake_ms:g} ms")
+    print("Ollama")
+
+    def bare_post():
+        r = requests.post(f"{host}/api/generate", json=payload, timeout=120)
+        r.raise_for_status()
+        r.json()
+    run("requests.post per call", bare_post, args.calls)
+    with OllamaClient(host) as client:
+        run("OllamaClient (pooled session)", lambda: client.generate("fake", "plan"), args.calls)
+
+    if _openai_available:
+        print("OpenAI")
+        messages = [{"role": "user", "content": "plan"}]
+
+        def fresh_client():
+            c = OpenAI(api_key="fake", base_url=f"{host}/v1")
+            c.chat.completions.create(model="fake", messages=messages)
+            c.close()
+        run("OpenAI() per call", fresh_client, args.calls)
+        with OpenAI(api_key="fake", base_url=f"{host}/v1") as shared:
+            run("one OpenAI client", lambda: shared.chat.completions.create(model="fake", messages=messages),
+                args.calls)
+    else:
+        print("(openai not installed, skipping the OpenAI rows)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
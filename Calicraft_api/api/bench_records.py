@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Memory / attribute-access comparison: JSON dicts vs pydantic models vs ExerciseRecord,
+on a synthetic catalog shaped like exercises.json.
+
+  python bench_records.py --n 10000
+"""
+import argparse
+import json
+import random
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from records import ExerciseRecord
+
+MUSCLE_POOL = [f"Muscle {i}" for i in range(60)]
+
+
+def synthetic(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        unit = rng.choice(["", "s"])
+        out.append({
+            "name": f"Exercise {i}",
+            "description": "Synthetic exercise for benchmarking. " * 3,
+            "difficulty": rng.randint(1, 10),
+            "muscles": {
+                "primary": rng.sample(MUSCLE_POOL, rng.randint(1, 3)),
+                "secondary": rng.sample(MUSCLE_POOL, rng.randint(0, 3)),
+                "tertiary": rng.sample(MUSCLE_POOL, rng.randint(0, 2)),
+            },
+            "reps": " / ".join(f"{v}{unit}" for v in sorted(rng.sample(range(3, 40), 3))),
+            "requiredSkills": [f"Exercise {rng.randrange(n)}" for _ in range(rng.randint(0, 2))],
+        })
+    return out
+
+
+def retained(build: Callable[[], Any]) -> float:
+    """MiB still allocated after build() (its return value is kept alive while measuring)."""
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return size / 2**20
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--n", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    blob = json.dumps(synthetic(args.n))
+    dicts = json.loads(blob)
+    records = [ExerciseRecord.from_dict(d, id=i) for i, d in enumerate(dicts)]
+
+    rows = [
+        ("dicts (json.loads)", retained(lambda: json.loads(blob))),
+        ("records", retained(lambda: [ExerciseRecord.from_dict(d, id=i) for i, d in enumerate(json.loads(blob))])),
+    ]
+    try:
+        from pydantic import BaseModel
+
+        class Muscles(BaseModel):
+            primary: List[str] = []
+            secondary: List[str] = []
+            tertiary: List[str] = []
+
+        class Exercise(BaseModel):
+            name: str
+            description: str
+            difficulty: int
+            muscles: Muscles
+            reps: str | None = None
+            requiredSkills: List[str] = []
+
+        # what app.py used to keep: the raw list and the models built from it
+        rows.append(("dicts + pydantic models", retained(lambda: (lambda raw: (raw, [Exercise(**e) for e in raw]))(json.loads(blob)))))
+        models = [Exercise(**e) for e in dicts]
+    except Exception:
+        models = None
+
+    print(f"{args.n} exercises, retained memory:")
+    for name, mib in rows:
+        print(f"  {name:<26} {mib:7.2f} MiB")
+
+    def dict_access():
+        t = 0
+        for ex in dicts:
+            t += int(ex.get("difficulty", 5)) + len(ex["muscles"]["primary"]) + len(ex.get("requiredSkills", []))
+        return t
+
+    def record_access():
+        t = 0
+        for ex in records:
+            t += ex.difficulty + len(ex.primary) + len(ex.skills)
+        return t
+
+    def model_access():
+        t = 0
+        for ex in models:
+            t += ex.difficulty + len(ex.muscles.primary) + len(ex.requiredSkills)
+        return t
+
+    assert dict_access() == record_access()
+    print(f"difficulty + primary + skills over all rows (best of {args.repeat}):")
+    for name, fn in [("dicts", dict_access), ("pydantic", model_access), ("records", record_access)]:
+        if name == "pydantic" and models is None:
+            continue
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print(f"  {name:<26} {best * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+# catalog.py
+"""
+Compiled, read-only view over exercises.json.
+
+Everything that used to be recomputed per request (normalized muscle sets,
+canonical prerequisite sets, int difficulty, reps tiers) is built once here at
+load time. Exercises are addressed by their integer id (= position in the JSON list).
+"""
+import hashlib
+import json
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from functools import cached_property
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from deterministic import compile_reps, norm
+from diversity import MuscleSimilarity
+from records import ExerciseRecord, load_exercises
+
+
+# -------------------- skill names --------------------
+
+def norm_basic(s: str) -> str:
+    return (s or "").strip().lower()
+
+# Minimal alias map – add more as you standardize names
+ALIASES = {
+    "hollow body hold": "hollow hold",
+    "arch body hold": "arch hold",
+    "pull-up": "pull up",
+    "chin-up": "chin up",
+}
+
+def canonical_skill(s: str) -> str:
+    t = norm_basic(s)
+    # normalize punctuation/hyphens/whitespace
+    t = re.sub(r"[^a-z0-9]+", " ", t).strip()
+    # alias collapse
+    return ALIASES.get(t, t)
+
+
+# -------------------- prerequisites --------------------
+
+class PrereqEngine:
+    """
+    Skills as bits. Every canonical skill gets one bit, so a set of skills is an int
+    and "all prerequisites met" is `req & ~unlocked == 0`.
+
+    Exercise names double as skill names ("Tuck Planche" is both), which makes
+    requiredSkills a graph that should be a DAG. `implied[skill]` is the skill's own bit
+    plus everything it transitively requires, so unlocking a hard progression unlocks
+    the easier ones; skills on a cycle all imply each other.
+    """
+
+    def __init__(self, names: List[str], requires: List[Iterable[str]]):
+        self.bit: Dict[str, int] = {}
+        edges: Dict[str, Set[str]] = {}
+        for name, reqs in zip(names, requires):
+            s = self.add(name)
+            for r in reqs:
+                edges.setdefault(s, set()).add(self.add(r))
+
+        # transitive closure over strongly connected components (iterative Tarjan):
+        # skills that require each other in a cycle all imply the same mask, and
+        # components come out successors-first, so their masks are already final
+        self.implied: Dict[str, int] = {}
+        index: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        scc: List[str] = []
+        on_scc: Set[str] = set()
+        for root in self.bit:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            scc.append(root)
+            on_scc.add(root)
+            stack = [(root, iter(sorted(edges.get(root, ()))))]
+            while stack:
+                node, it = stack[-1]
+                child = next(it, None)
+                if child is not None:
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        scc.append(child)
+                        on_scc.add(child)
+                        stack.append((child, iter(sorted(edges.get(child, ())))))
+                    elif child in on_scc:
+                        low[node] = min(low[node], index[child])
+                    continue
+                stack.pop()
+                if stack:
+                    parent = stack[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] != index[node]:
+                    continue
+                members = []
+                while True:
+                    m = scc.pop()
+                    on_scc.discard(m)
+                    members.append(m)
+                    if m == node:
+                        break
+                mask = 0
+                for m in members:
+                    mask |= self.bit[m]
+                    for r in edges.get(m, ()):
+                        if r not in on_scc and r in self.implied:
+                            mask |= self.implied[r]
+                for m in members:
+                    self.implied[m] = mask
+
+    @classmethod
+    def from_tables(cls, bit: Mapping[str, int], implied: Mapping[str, int]) -> "PrereqEngine":
+        """
+        Read-only engine over precomputed tables (see catalog_bin, which may pass
+        mappings that decode masks on access). add() must not be called on it.
+        """
+        eng = cls.__new__(cls)
+        eng.bit = bit
+        eng.implied = implied
+        return eng
+
+    def add(self, skill: str) -> str:
+        """Canonicalize `skill`, assigning it the next free bit if it's new."""
+        s = sys.intern(canonical_skill(skill))
+        if s not in self.bit:
+            self.bit[s] = 1 << len(self.bit)
+        return s
+
+    def mask(self, skills: Iterable[str]) -> int:
+        """Exact mask of `skills`; names the catalog never mentions contribute nothing."""
+        m = 0
+        for x in skills:
+            m |= self.bit.get(canonical_skill(x), 0)
+        return m
+
+    def unlocked_mask(self, skills: Iterable[str], implied: bool = True) -> int:
+        """Mask of what a user with `skills` may do, including easier progressions if `implied`."""
+        if not implied:
+            return self.mask(skills)
+        m = 0
+        for x in skills:
+            m |= self.implied.get(canonical_skill(x), 0)
+        return m
+
+    @staticmethod
+    def ok(req: int, unlocked: int) -> bool:
+        return req & ~unlocked == 0
+
+
+# -------------------- pool index --------------------
+
+# byte value -> positions of its set bits
+_BYTE_BITS = [tuple(j for j in range(8) if b >> j & 1) for b in range(256)]
+_NONZERO_RUN = re.compile(rb"[^\x00]+")
+
+def bits_to_ids(x: int) -> List[int]:
+    """Set bit positions of `x`, ascending. Zero bytes are skipped in C, so this is ~O(result)."""
+    out: List[int] = []
+    data = x.to_bytes((x.bit_length() + 7) // 8, "little")
+    for run in _NONZERO_RUN.finditer(data):
+        base = run.start() * 8
+        for byte in run.group():
+            for j in _BYTE_BITS[byte]:
+                out.append(base + j)
+            base += 8
+    return out
+
+def ids_to_bits(ids: Iterable[int]) -> int:
+    ids = list(ids)
+    if not ids:
+        return 0
+    buf = bytearray((max(ids) >> 3) + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+def _has_bit(data: bytes, i: int) -> bool:
+    """Bit i of the little-endian int whose bytes are `data` (O(1), unlike x >> i & 1)."""
+    q = i >> 3
+    return q < len(data) and data[q] >> (i & 7) & 1 == 1
+
+def _int_bytes(x: int) -> bytes:
+    return x.to_bytes((x.bit_length() + 7) // 8, "little")
+
+class PoolIndex:
+    """
+    Bitsets for the pool filter (difficulty range, target muscles, prerequisites).
+    Every set is an int with bit i = catalog id i, so a request is a few big-int
+    ORs/ANDs and the ids come back in catalog order.
+
+      members[d]  -> ids with difficulty d
+      requires[d] -> ids with difficulty d that have at least one prerequisite
+      needs[d]    -> OR of those ids' req masks (skill bits, see PrereqEngine)
+      muscles[m]  -> ids listing normalized muscle m in any tier
+      req_pos[req_off[i]:req_off[i + 1]]   -> skill bit positions id i requires
+      need_ids[need_off[b]:need_off[b + 1]] -> ids that require skill bit b
+
+    Only buckets whose `needs` the user hasn't fully unlocked are gated, and there
+    only the ids that require something. Those are settled from whichever side
+    touches fewest ids: the skills still locked (their needers are out), the skills
+    unlocked (only their needers can be in), or each id's own requirements. An
+    n-bit `req & ~unlocked` per exercise would make gating O(n) per candidate.
+    """
+
+    def __init__(
+        self,
+        members: Dict[int, int],
+        requires: Dict[int, int],
+        needs: Dict[int, int],
+        muscles: Dict[str, int],
+        req_off: Sequence[int],
+        req_pos: Sequence[int],
+        need_off: Sequence[int],
+        need_ids: Sequence[int],
+    ):
+        self.members = members
+        self.requires = requires
+        self.needs = needs
+        self.muscles = muscles
+        self.req_off, self.req_pos = req_off, req_pos
+        self.need_off, self.need_ids = need_off, need_ids
+        self.required = 0   # every skill some exercise requires
+        for need in needs.values():
+            self.required |= need
+
+    @classmethod
+    def build(
+        cls,
+        by_difficulty: Dict[int, Sequence[int]],
+        postings: Dict[str, Dict[str, Sequence[int]]],
+        req_mask: Sequence[int],
+    ) -> "PoolIndex":
+        members: Dict[int, int] = {}
+        requires: Dict[int, int] = {}
+        needs: Dict[int, int] = {}
+        for d, ids in by_difficulty.items():
+            members[d] = ids_to_bits(ids)
+            requires[d] = ids_to_bits(i for i in ids if req_mask[i])
+            need = 0
+            for i in ids:
+                need |= req_mask[i]
+            needs[d] = need
+        muscles: Dict[str, int] = {}
+        for tier in TIERS:
+            for m, ids in postings[tier].items():
+                muscles[m] = muscles.get(m, 0) | ids_to_bits(ids)
+        req_off, req_pos = array("i", [0]), array("i")
+        needers: Dict[int, List[int]] = {}
+        for i, req in enumerate(req_mask):
+            if req:
+                for b in bits_to_ids(req):
+                    req_pos.append(b)
+                    needers.setdefault(b, []).append(i)
+            req_off.append(len(req_pos))
+        need_off, need_ids = array("i", [0]), array("i")
+        for b in range(max(needers, default=-1) + 1):
+            need_ids.extend(needers.get(b, ()))
+            need_off.append(len(need_ids))
+        return cls(members, requires, needs, muscles, req_off, req_pos, need_off, need_ids)
+
+    def _needers(self, skills: int) -> List[int]:
+        off, ids = self.need_off, self.need_ids
+        out: List[int] = []
+        for b in bits_to_ids(skills):
+            out.extend(ids[off[b]:off[b + 1]])
+        return out
+
+    def _unmet(self, ids: Iterable[int], have: bytes) -> List[int]:
+        """Ids with at least one required skill bit not set in `have` (unlocked, as bytes)."""
+        off, pos = self.req_off, self.req_pos
+        out: List[int] = []
+        for i in ids:
+            for b in pos[off[i]:off[i + 1]]:
+                if not _has_bit(have, b):
+                    out.append(i)
+                    break
+        return out
+
+    def _blocked(self, check: int, unlocked: int) -> int:
+        """Subset of `check` (ids that require something) with a prerequisite not in `unlocked`."""
+        missing = self.required & ~unlocked
+        granted = self.required & unlocked
+        fan = len(self.need_ids) / max(1, self.required.bit_count())   # avg ids per skill
+        cost = {
+            "missing": missing.bit_count() * fan,
+            "granted": granted.bit_count() * fan,
+            "each": check.bit_count(),
+        }
+        way = min(cost, key=cost.__getitem__)
+        if way == "missing":
+            return check & ids_to_bits(self._needers(missing))
+        have = _int_bytes(unlocked)
+        if way == "granted":
+            # an id whose every requirement is granted needs at least one granted skill
+            c = _int_bytes(check)
+            maybe = {i for i in self._needers(granted) if _has_bit(c, i)}
+            ok = maybe.difference(self._unmet(maybe, have))
+            return check & ~ids_to_bits(ok)
+        return ids_to_bits(self._unmet(bits_to_ids(check), have))
+
+    def target_mask(self, targets: Iterable[str]) -> int:
+        """Ids listing any of `targets` (normalized muscle names) in any tier."""
+        hit = 0
+        for t in targets:
+            hit |= self.muscles.get(t, 0)
+        return hit
+
+    def mask(
+        self,
+        min_difficulty: int,
+        max_difficulty: int,
+        targets: Optional[Iterable[str]] = None,
+        unlocked: Optional[int] = None,
+    ) -> int:
+        """Bitset of the ids catalog.filter() would return for the same arguments."""
+        buckets = [d for d in self.members if min_difficulty <= d <= max_difficulty]
+        out = 0
+        for d in buckets:
+            out |= self.members[d]
+        if targets:
+            out &= self.target_mask(targets)
+        if unlocked is not None and out:
+            check = 0
+            for d in buckets:
+                if self.needs[d] & ~unlocked:
+                    check |= self.requires[d]
+            check &= out
+            if check:
+                out &= ~self._blocked(check, unlocked)
+        return out
+
+
+# -------------------- catalog --------------------
+
+TIERS = ("primary", "secondary", "tertiary")
+TIER_WEIGHTS = {"primary": 3, "secondary": 2, "tertiary": 1}
+
+def _contains(posting: Sequence[int], i: int) -> bool:
+    j = bisect_left(posting, i)
+    return j < len(posting) and posting[j] == i
+
+def content_hash(exercises: List[Dict[str, Any]]) -> str:
+    """sha256 of the canonical JSON, ignoring derived "_" keys."""
+    source = [{k: v for k, v in ex.items() if not k.startswith("_")} for ex in exercises]
+    return hashlib.sha256(
+        json.dumps(source, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+def report_invalid_reps(invalid: List[Tuple[int, str, str]]) -> None:
+    if invalid:
+        print(f"[catalog] {len(invalid)} reps field(s) need fixing:", file=sys.stderr)
+        for i, name, problem in invalid:
+            print(f"  #{i} {name}: {problem}", file=sys.stderr)
+
+class ExerciseCatalog:
+    """
+    Pre-normalized exercise table. Build once, share across requests, never mutate.
+
+      catalog.exercises[i]   -> original dict from the JSON (empty if keep_source=False)
+      catalog.records[i]     -> the same exercise as a compact ExerciseRecord
+      catalog.muscles[i]     -> frozenset of interned, normalized muscle names (all tiers)
+      catalog.req_mask[i]    -> requiredSkills as a PrereqEngine bitmask
+      catalog.difficulty[i]  -> int difficulty
+      catalog.postings[tier][muscle] -> ascending ids listing that muscle in that tier
+      catalog.pool           -> PoolIndex behind filter()
+      catalog.similarity     -> MuscleSimilarity for diversity.mmr (built on first use)
+      catalog.content_hash   -> sha256 of the canonical JSON (changes iff the data does)
+      catalog.invalid_reps   -> [(id, name, problem)] for reps fields that didn't parse cleanly
+
+    Each exercise dict also gets its id, compiled reps tiers and name features
+    cached under "_id" / "_tiers" / "_features" (see deterministic.reps_tiers /
+    features); keys starting with "_" are derived and are left out of content_hash.
+    """
+
+    def __init__(self, exercises: List[Dict[str, Any]], keep_source: bool = True):
+        self.content_hash = content_hash(exercises)
+        self.muscles: List[FrozenSet[str]] = []
+        self.req_mask: List[int] = []
+        self.difficulty: List[int] = []
+        # difficulty value -> ids, ascending; lets filter() skip out-of-range rows entirely
+        self.by_difficulty: Dict[int, List[int]] = {}
+        # inverted index: tier -> normalized muscle -> ids (ascending, no repeats;
+        # lists here, zero-copy memoryviews when loaded by catalog_bin)
+        self.postings: Dict[str, Dict[str, Sequence[int]]] = {t: {} for t in TIERS}
+        # normalized muscle -> spelling as first seen in the JSON (for focus_scores keys)
+        self.display: Dict[str, str] = {}
+        self.invalid_reps: List[Tuple[int, str, str]] = []
+        self.records: List[ExerciseRecord] = []
+
+        for i, ex in enumerate(exercises):
+            m = ex.get("muscles", {})
+            bag: Set[str] = set()
+            for tier in TIERS:
+                for raw in m.get(tier, []):
+                    k = sys.intern(norm(raw))
+                    self.display.setdefault(k, raw)
+                    bag.add(k)
+                    posting = self.postings[tier].setdefault(k, [])
+                    if not posting or posting[-1] != i:
+                        posting.append(i)
+            self.muscles.append(frozenset(bag))
+            tiers, problem = compile_reps(ex.get("reps", ""))
+            if problem:
+                self.invalid_reps.append((i, ex.get("name", ""), problem))
+            rec = ExerciseRecord.from_dict(ex, id=i, tiers=tiers)
+            self.records.append(rec)
+            if keep_source:
+                ex["_id"], ex["_features"], ex["_tiers"] = i, rec.features, rec.tiers
+            self.difficulty.append(rec.difficulty)
+            self.by_difficulty.setdefault(rec.difficulty, []).append(i)
+
+        self.skills = PrereqEngine(
+            [ex.get("name", "") for ex in exercises],
+            [ex.get("requiredSkills", []) for ex in exercises],
+        )
+        self.req_mask = [self.skills.mask(ex.get("requiredSkills", [])) for ex in exercises]
+        # the dict-based planners (deterministic, vectorized) need the source dicts;
+        # record-only callers can let them go once everything above is built
+        self.exercises: Sequence[Dict[str, Any]] = exercises if keep_source else []
+        # only set for catalogs mapped from a compiled artifact (catalog_bin)
+        self.arrays: Optional[Dict[str, memoryview]] = None
+        self.strings: Optional[Sequence[str]] = None
+        self.pool = PoolIndex.build(self.by_difficulty, self.postings, self.req_mask)
+        report_invalid_reps(self.invalid_reps)
+
+    @classmethod
+    def load(cls, path: str, keep_source: bool = True) -> "ExerciseCatalog":
+        return cls(load_exercises(path), keep_source=keep_source)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @cached_property
+    def similarity(self) -> MuscleSimilarity:
+        return MuscleSimilarity(TIER_WEIGHTS)
+
+    def index(self, ex: Dict[str, Any]) -> int:
+        """Catalog id of one of self.exercises (stored on the dict as "_id")."""
+        return ex["_id"]
+
+    def tier_scores(self, targets: Iterable[str]) -> Dict[int, int]:
+        """
+        id -> 3*|primary ∩ targets| + 2*|secondary ∩ targets| + 1*|tertiary ∩ targets|,
+        only for ids that hit at least one target.
+        """
+        scores: Dict[int, int] = {}
+        for t in set(targets):
+            for tier in TIERS:
+                w = TIER_WEIGHTS[tier]
+                for i in self.postings[tier].get(t, ()):
+                    scores[i] = scores.get(i, 0) + w
+        return scores
+
+    def focus_scores(self, ids: Iterable[int], targets: Iterable[str]) -> Dict[str, int]:
+        """Per-target muscle totals over the chosen ids, highest first."""
+        ids = list(ids)
+        scores: Dict[str, int] = {}
+        for t in set(targets):
+            total = 0
+            for tier in TIERS:
+                posting = self.postings[tier].get(t)
+                if posting:
+                    total += TIER_WEIGHTS[tier] * sum(_contains(posting, i) for i in ids)
+            if total:
+                scores[self.display[t]] = total
+        return dict(sorted(scores.items(), key=lambda kv: (-kv[1], kv[0])))
+
+    def filter(
+        self,
+        min_difficulty: int,
+        max_difficulty: int,
+        targets: Set[str],
+        unlocked: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Ids that pass the difficulty range, overlap `targets` (normalized muscle
+        names; empty = no muscle filter) and, if `unlocked` is given, have all
+        prerequisites in it (a mask from self.skills.unlocked_mask). Returned in catalog order.
+        """
+        return bits_to_ids(self.pool.mask(min_difficulty, max_difficulty, targets, unlocked))
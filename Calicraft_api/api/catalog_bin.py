@@ -0,0 +1,544 @@
+# catalog_bin.py
+"""
+Versioned binary form of an ExerciseCatalog (written by compile_catalog.py).
+
+Loading from JSON means json.load plus normalizing every muscle, canonicalizing
+every skill, the prerequisite closure, the reps regexes and the name keyword
+scans. The artifact stores the result of all of that, so loading it is one mmap
+and some list building:
+
+  header    magic, format version, content hash, source size + mtime, section directory
+  strings   one interned table (int32 offsets + utf-8 blob); everything else stores ids
+  columns   struct-of-arrays int32, one slot per exercise (name, difficulty, reps, ...)
+  lists     CSR pairs (offsets, values): muscles per tier, skills, equipment, reps tiers
+  indexes   muscle postings per tier, prerequisite bits and their closure,
+            PoolIndex bitsets (difficulty buckets, muscles)
+
+Posting lists, difficulty buckets and the scorer columns are served as views
+straight out of the mapping (no copy). load_catalog() uses the artifact when it
+matches the JSON and falls back to parsing the JSON when it is missing, stale or
+from another format version. load_shared() is the multi-worker variant: it
+compiles the artifact if needed and maps it lazily.
+
+Artifacts (and their .lock / .tmp files) live in artifact_dir(), never next to the
+JSON: Swift App/New Project/Data is a synchronized group in the Xcode project, so
+anything written there would be bundled into the iOS app.
+"""
+import functools
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from catalog import TIERS, ExerciseCatalog, PoolIndex, PrereqEngine, content_hash, report_invalid_reps
+from deterministic import Features, RepsTiers, norm
+from file_lock import locked
+from records import MUSCLES, ExerciseRecord, load_exercises
+
+MAGIC = b"CALICAT\0"
+VERSION = 3
+SUFFIX = ".catalog"
+HEADER = struct.Struct("<8sHHI32sqqI")   # magic, version, reserved, n, sha256, src size, src mtime_ns, sections
+SECTION = struct.Struct("<8sQQ")         # name, offset, size
+ALIGN = 8
+
+# bits of the FLAG column: which optional keys the source dict had
+HAS_DESCRIPTION = 1 << 0
+HAS_DIFFICULTY = 1 << 1
+HAS_EQUIPMENT = 1 << 2
+
+
+class StaleArtifact(ValueError):
+    """The artifact doesn't describe the JSON it was asked to stand in for."""
+
+
+def artifact_dir() -> str:
+    """$CATALOG_ARTIFACT_DIR, else calicraft/ in the user cache dir ($XDG_CACHE_HOME or ~/.cache)."""
+    return os.getenv("CATALOG_ARTIFACT_DIR") or os.path.join(
+        os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "calicraft"
+    )
+
+def artifact_path(json_path: str, directory: Optional[str] = None) -> str:
+    """
+    Default artifact for `json_path`: <directory or artifact_dir()>/<stem>-<hash>.catalog,
+    the hash being of the JSON's real path, so two exercises.json never share one.
+    """
+    key = hashlib.sha256(os.path.realpath(json_path).encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(json_path))[0]
+    return os.path.join(directory or artifact_dir(), f"{stem}-{key}{SUFFIX}")
+
+
+# -------------------- writing --------------------
+
+class _Strings:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.items: List[str] = []
+
+    def __call__(self, s: Optional[str]) -> int:
+        if s is None:
+            return -1
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.items)
+            self.items.append(s)
+        return i
+
+class _CSR:
+    def __init__(self):
+        self.offsets = array("i", [0])
+        self.values = array("i")
+
+    def add(self, values: Iterable[int]) -> None:
+        self.values.extend(values)
+        self.offsets.append(len(self.values))
+
+class _Blobs:
+    """CSR over bytes: one little-endian int (a skill mask) per slot."""
+    def __init__(self):
+        self.offsets = array("i", [0])
+        self.data = bytearray()
+
+    def add(self, mask: int) -> None:
+        self.data += mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        self.offsets.append(len(self.data))
+
+def _is_strs(x: Any) -> bool:
+    return isinstance(x, list) and all(isinstance(v, str) for v in x)
+
+def compile_catalog(json_path: str, out_path: Optional[str] = None) -> Tuple[str, ExerciseCatalog]:
+    """Build the catalog from `json_path` and write it to out_path (default: artifact_path)."""
+    out_path = out_path or artifact_path(json_path)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    st = os.stat(json_path)
+    cat = ExerciseCatalog(load_exercises(json_path))
+    n = len(cat)
+
+    S = _Strings()
+    cols: Dict[str, array] = {k: array("i") for k in (
+        "NAME", "DESC", "DIFF", "REPS", "FLAG", "XTRA", "BADR",
+        "FKEY", "FSLG", "FMOV", "FFLG", "FNOT", "TUNI",
+    )}
+    lists: Dict[str, _CSR] = {k: _CSR() for k in ("M0", "M1", "M2", "SKL", "EQ", "TIE")}
+    masks: Dict[str, _Blobs] = {"REQ": _Blobs(), "IMP": _Blobs()}
+    bad = {i: problem for i, _, problem in cat.invalid_reps}
+
+    for i, ex in enumerate(cat.exercises):
+        rec = cat.records[i]
+        # standard keys go into columns; anything that wouldn't round-trip exactly
+        # (odd types, unknown keys) is kept verbatim as a small JSON blob
+        extra = {k: v for k, v in ex.items() if not k.startswith("_") and k not in (
+            "name", "description", "difficulty", "muscles", "reps", "requiredSkills", "equipment")}
+        flags = 0
+        if not isinstance(ex.get("name"), str):
+            raise ValueError(f"{json_path}: exercise #{i} has a non-string name")
+        cols["NAME"].append(S(ex["name"]))
+        desc = ex.get("description")
+        if isinstance(desc, str):
+            flags |= HAS_DESCRIPTION
+        elif "description" in ex:
+            extra["description"] = desc
+        cols["DESC"].append(S(desc) if isinstance(desc, str) else -1)
+        d = ex.get("difficulty")
+        if isinstance(d, int) and not isinstance(d, bool):
+            flags |= HAS_DIFFICULTY
+        elif "difficulty" in ex:
+            extra["difficulty"] = d
+        cols["DIFF"].append(rec.difficulty)
+        m = ex.get("muscles")
+        if not (isinstance(m, dict) and set(m) == set(TIERS) and all(_is_strs(m[t]) for t in TIERS)):
+            extra["muscles"] = m
+        for j, tier in enumerate(TIERS):
+            tier_raw = m.get(tier, []) if isinstance(m, dict) else []
+            lists[f"M{j}"].add(S(x) for x in tier_raw if isinstance(x, str))
+        reps = ex.get("reps")
+        if reps is not None and not isinstance(reps, str):
+            extra["reps"] = reps
+        cols["REPS"].append(S(reps) if isinstance(reps, str) else -1)
+        skills = ex.get("requiredSkills")
+        if not _is_strs(skills):
+            extra["requiredSkills"] = skills
+        lists["SKL"].add(S(x) for x in rec.skills if isinstance(x, str))
+        if "equipment" in ex:
+            if _is_strs(ex["equipment"]):
+                flags |= HAS_EQUIPMENT
+            else:
+                extra["equipment"] = ex["equipment"]
+        lists["EQ"].add(S(x) for x in rec.equipment if isinstance(x, str))
+        cols["FLAG"].append(flags)
+        cols["XTRA"].append(S(json.dumps(extra, ensure_ascii=False)) if extra else -1)
+        cols["BADR"].append(S(bad.get(i)))
+
+        ft = rec.features
+        cols["FKEY"].append(S(ft.key))
+        cols["FSLG"].append(S(ft.slug))
+        cols["FMOV"].append(S(ft.movement))
+        cols["FFLG"].append(ft.flags)
+        cols["FNOT"].append(S(ft.notes))
+        cols["TUNI"].append(S(rec.tiers.unit))
+        lists["TIE"].add(rec.tiers.values)
+        masks["REQ"].add(cat.req_mask[i])
+
+    # indexes
+    for j, tier in enumerate(TIERS):
+        keys = array("i")
+        ids = _CSR()
+        for k, posting in cat.postings[tier].items():
+            keys.append(S(k))
+            ids.add(posting)
+        cols[f"P{j}K"] = keys
+        lists[f"P{j}"] = ids
+    cols["DSPK"] = array("i", [S(k) for k in cat.display])
+    cols["DSPV"] = array("i", [S(v) for v in cat.display.values()])
+    skill_names = sorted(cat.skills.bit, key=cat.skills.bit.__getitem__)
+    cols["SKN"] = array("i", [S(s) for s in skill_names])
+    for s in skill_names:
+        masks["IMP"].add(cat.skills.implied[s])
+    diffs = sorted(cat.by_difficulty)
+    cols["BYDK"] = array("i", diffs)
+    lists["BYD"] = _CSR()
+    for d in diffs:
+        lists["BYD"].add(cat.by_difficulty[d])
+    # PoolIndex bitsets: buckets in BYDK order, muscles in DSPK order
+    for k in ("PXM", "PXR", "PXN", "PXU"):
+        masks[k] = _Blobs()
+    for d in diffs:
+        masks["PXM"].add(cat.pool.members[d])
+        masks["PXR"].add(cat.pool.requires[d])
+        masks["PXN"].add(cat.pool.needs[d])
+    for k in cat.display:
+        masks["PXU"].add(cat.pool.muscles[k])
+    for k, (off, vals) in (("PXP", (cat.pool.req_off, cat.pool.req_pos)), ("PXS", (cat.pool.need_off, cat.pool.need_ids))):
+        lists[k] = _CSR()
+        for q in range(len(off) - 1):
+            lists[k].add(vals[off[q]:off[q + 1]])
+
+    # flat (row, column) pairs that VectorScorer reads in place: muscle columns are
+    # positions in DSPK, equipment columns positions in QK
+    mcol = {k: c for c, k in enumerate(cat.display)}
+    qcol: Dict[str, int] = {}
+    for j, tier in enumerate(TIERS):
+        rows, cs = array("i"), array("i")
+        for rec in cat.records:
+            for m_id in getattr(rec, tier):
+                rows.append(rec.id)
+                cs.append(mcol[MUSCLES.keys[m_id]])
+        cols[f"W{j}R"], cols[f"W{j}C"] = rows, cs
+    rows, cs = array("i"), array("i")
+    for rec in cat.records:
+        for x in rec.equipment:
+            rows.append(rec.id)
+            cs.append(qcol.setdefault(norm(x), len(qcol)))
+    cols["QR"], cols["QC"] = rows, cs
+    cols["QK"] = array("i", [S(k) for k in qcol])
+
+    blob = bytearray()
+    offsets = array("i", [0])
+    for s in S.items:
+        blob += s.encode("utf-8")
+        offsets.append(len(blob))
+
+    sections: List[Tuple[str, bytes]] = [("STRO", offsets.tobytes()), ("STRB", bytes(blob))]
+    sections += [(k, a.tobytes()) for k, a in cols.items()]
+    for k, csr in lists.items():
+        sections += [(k + "O", csr.offsets.tobytes()), (k + "V", csr.values.tobytes())]
+    for k, blobs in masks.items():
+        sections += [(k + "O", blobs.offsets.tobytes()), (k + "B", bytes(blobs.data))]
+
+    pos = HEADER.size + SECTION.size * len(sections)
+    directory = []
+    body = bytearray()
+    for name, data in sections:
+        pad = -(pos + len(body)) % ALIGN
+        body += b"\0" * pad
+        directory.append(SECTION.pack(name.encode("ascii"), pos + len(body), len(data)))
+        body += data
+    header = HEADER.pack(MAGIC, VERSION, 0, n, bytes.fromhex(cat.content_hash),
+                         st.st_size, st.st_mtime_ns, len(sections))
+
+    # write-then-rename so a reader never maps a half-written file
+    tmp = f"{out_path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(b"".join(directory))
+        f.write(body)
+    os.replace(tmp, out_path)
+
+    # the artifact has to give back exactly what the JSON did
+    back = read_compiled(out_path)
+    if back.content_hash != content_hash(back.exercises):
+        os.remove(out_path)
+        raise ValueError(f"{out_path}: compiled catalog doesn't round-trip {json_path}")
+    return out_path, cat
+
+
+# -------------------- reading --------------------
+
+def read_header(path: str) -> Tuple[int, int, str, int, int]:
+    """(version, n, content_hash, source size, source mtime_ns) without mapping the file."""
+    with open(path, "rb") as f:
+        raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise ValueError(f"{path}: truncated catalog artifact")
+    magic, version, _, n, digest, size, mtime_ns, _ = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a compiled catalog")
+    return version, n, digest.hex(), size, mtime_ns
+
+def check_fresh(path: str, json_path: str) -> None:
+    """Raise StaleArtifact unless `path` was compiled by this version from `json_path` as it is now."""
+    version, _, _, size, mtime_ns = read_header(path)
+    if version != VERSION:
+        raise StaleArtifact(f"{path}: format v{version}, this code reads v{VERSION}")
+    st = os.stat(json_path)
+    if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+        raise StaleArtifact(f"{path}: {json_path} changed since it was compiled")
+
+class _Rows(Sequence):
+    """
+    Read-only sequence whose items are built from the mapping on access, kept in an
+    LRU of `cache` rows (None: one slot per row, so repeated full scans build each
+    row once; 0: no cache).
+    """
+
+    def __init__(self, n: int, make: Callable[[int], Any], cache: Optional[int] = None):
+        self._n = n
+        cache = n if cache is None else cache
+        self._get = functools.lru_cache(maxsize=cache)(make) if cache else make
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return self._get(i)
+
+class _SkillTable(Mapping):
+    """skill name -> value(bit index), computed on access (LRU sized like _Rows)."""
+
+    def __init__(self, index: Dict[str, int], value: Callable[[int], int], cache: Optional[int] = None):
+        self._index = index
+        cache = len(index) if cache is None else cache
+        self._value = functools.lru_cache(maxsize=cache)(value) if cache else value
+
+    def __getitem__(self, skill: str) -> int:
+        return self._value(self._index[skill])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+def read_compiled(path: str, keep_source: bool = True, lazy: bool = False,
+                  cache_rows: Optional[int] = None) -> ExerciseCatalog:
+    """
+    Map a compiled catalog. With lazy=True nothing per-exercise is materialized up
+    front: records, source dicts, skill masks and strings are built on access from
+    the read-only mapping, and difficulty / posting / scorer columns stay views of it,
+    so processes that map the same file share those pages (see load_shared).
+
+    cache_rows bounds how many built records / dicts / strings / skill masks each
+    lazy table keeps: None keeps every one that was touched (a full scan costs one
+    build per row, once), a number caps memory at the price of rebuilding rows that
+    fall out on scans wider than it, 0 rebuilds on every access.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if sys.byteorder != "little":
+        raise StaleArtifact(f"{path}: artifacts are little-endian")
+    buf = memoryview(mm)
+    magic, version, _, n, digest, _, _, count = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise StaleArtifact(f"{path}: not a v{VERSION} compiled catalog")
+    sec: Dict[str, memoryview] = {}
+    for j in range(count):
+        name, off, size = SECTION.unpack_from(buf, HEADER.size + j * SECTION.size)
+        sec[name.rstrip(b"\0").decode("ascii")] = buf[off:off + size]
+
+    def raw(name: str) -> memoryview:
+        if name not in sec:
+            raise StaleArtifact(f"{path}: missing section {name}")
+        return sec[name]
+
+    def col(name: str) -> memoryview:
+        return raw(name).cast("i")
+
+    def csr(name: str) -> Tuple[memoryview, memoryview]:
+        return col(name + "O"), col(name + "V")
+
+    def mask_at(name: str) -> Callable[[int], int]:
+        o, b = col(name + "O"), raw(name + "B")
+        return lambda k: int.from_bytes(b[o[k]:o[k + 1]], "little")
+
+    so, sb = col("STRO"), raw("STRB")
+    def decode(k: int) -> str:
+        return sys.intern(str(sb[so[k]:so[k + 1]], "utf-8"))
+    strs: Sequence[str] = _Rows(len(so) - 1, decode, cache=cache_rows) if lazy else [decode(k) for k in range(len(so) - 1)]
+
+    NAME, DESC, DIFF, REPS, FLAG, XTRA, BADR = (col(k) for k in ("NAME", "DESC", "DIFF", "REPS", "FLAG", "XTRA", "BADR"))
+    FKEY, FSLG, FMOV, FFLG, FNOT, TUNI = (col(k) for k in ("FKEY", "FSLG", "FMOV", "FFLG", "FNOT", "TUNI"))
+    musc = [csr(f"M{j}") for j in range(len(TIERS))]
+    SKLO, SKLV = csr("SKL")
+    EQO, EQV = csr("EQ")
+    TIEO, TIEV = csr("TIE")
+
+    mids: Dict[int, int] = {}   # string id -> MUSCLES id
+    def mid(k: int) -> int:
+        m = mids.get(k)
+        if m is None:
+            m = mids[k] = MUSCLES.intern(strs[k])
+        return m
+
+    def features(i: int) -> Features:
+        return Features(strs[FKEY[i]], strs[FSLG[i]], strs[FMOV[i]], FFLG[i], DIFF[i], strs[FNOT[i]])
+
+    def tiers(i: int) -> RepsTiers:
+        return RepsTiers(tuple(TIEV[TIEO[i]:TIEO[i + 1]]), strs[TUNI[i]])
+
+    def muscle_sids(i: int) -> List[memoryview]:
+        return [V[O[i]:O[i + 1]] for O, V in musc]
+
+    def make_record(i: int) -> ExerciseRecord:
+        prim, sec_, ter = (tuple(mid(k) for k in r) for r in muscle_sids(i))
+        return ExerciseRecord(
+            id=i, name=strs[NAME[i]], description=strs[DESC[i]] if DESC[i] >= 0 else "",
+            difficulty=DIFF[i], reps=strs[REPS[i]] if REPS[i] >= 0 else None,
+            primary=prim, secondary=sec_, tertiary=ter,
+            skills=tuple(strs[k] for k in SKLV[SKLO[i]:SKLO[i + 1]]),
+            equipment=tuple(strs[k] for k in EQV[EQO[i]:EQO[i + 1]]),
+            tiers=tiers(i), features=features(i),
+        )
+
+    def make_dict(i: int) -> Dict[str, Any]:
+        flags = FLAG[i]
+        ex: Dict[str, Any] = {"name": strs[NAME[i]]}
+        if flags & HAS_DESCRIPTION:
+            ex["description"] = strs[DESC[i]]
+        if flags & HAS_DIFFICULTY:
+            ex["difficulty"] = DIFF[i]
+        ex["muscles"] = {t: [strs[k] for k in r] for t, r in zip(TIERS, muscle_sids(i))}
+        ex["reps"] = strs[REPS[i]] if REPS[i] >= 0 else None
+        ex["requiredSkills"] = [strs[k] for k in SKLV[SKLO[i]:SKLO[i + 1]]]
+        if flags & HAS_EQUIPMENT:
+            ex["equipment"] = [strs[k] for k in EQV[EQO[i]:EQO[i + 1]]]
+        if XTRA[i] >= 0:
+            ex.update(json.loads(strs[XTRA[i]]))
+        ex["_id"], ex["_features"], ex["_tiers"] = i, features(i), tiers(i)
+        return ex
+
+    def make_muscles(i: int) -> FrozenSet[str]:
+        return frozenset(norm(strs[k]) for r in muscle_sids(i) for k in r)
+
+    cat = ExerciseCatalog.__new__(ExerciseCatalog)
+    cat.content_hash = digest.hex()
+    # masks are n-bit ints (every exercise name is a skill), so lazily they're only
+    # decoded for the skills and exercises a request actually touches
+    skill_index = {strs[k]: b for b, k in enumerate(col("SKN"))}
+    implied = mask_at("IMP")
+    req = mask_at("REQ")
+    if lazy:
+        cat.skills = PrereqEngine.from_tables(
+            _SkillTable(skill_index, lambda b: 1 << b, cache=0), _SkillTable(skill_index, implied, cache=cache_rows)
+        )
+        cat.records = _Rows(n, make_record, cache=cache_rows)
+        cat.exercises = _Rows(n, make_dict, cache=cache_rows) if keep_source else []
+        cat.muscles = _Rows(n, make_muscles, cache=0)
+        cat.req_mask = _Rows(n, req, cache=0)
+    else:
+        cat.skills = PrereqEngine.from_tables(
+            {s: 1 << b for s, b in skill_index.items()}, {s: implied(b) for s, b in skill_index.items()}
+        )
+        cat.records = [make_record(i) for i in range(n)]
+        cat.exercises = [make_dict(i) for i in range(n)] if keep_source else []
+        cat.muscles = [make_muscles(i) for i in range(n)]
+        cat.req_mask = [req(i) for i in range(n)]
+    cat.difficulty = DIFF
+    cat.invalid_reps = [(i, strs[NAME[i]], strs[BADR[i]]) for i in range(n) if BADR[i] >= 0]
+
+    # zero-copy indexes: memoryview slices over the mapping
+    BO, BV = csr("BYD")
+    cat.by_difficulty = {d: BV[BO[q]:BO[q + 1]] for q, d in enumerate(col("BYDK"))}
+    cat.postings = {}
+    for j, tier in enumerate(TIERS):
+        PO, PV = csr(f"P{j}")
+        cat.postings[tier] = {strs[k]: PV[PO[q]:PO[q + 1]] for q, k in enumerate(col(f"P{j}K"))}
+    cat.display = {strs[k]: strs[v] for k, v in zip(col("DSPK"), col("DSPV"))}
+    # a few n-bit ints per bucket/muscle, decoded once: every filter() reads them
+    members, requires, needs, muscles = (mask_at(k) for k in ("PXM", "PXR", "PXN", "PXU"))
+    diffs = list(enumerate(col("BYDK")))
+    cat.pool = PoolIndex(
+        {d: members(q) for q, d in diffs},
+        {d: requires(q) for q, d in diffs},
+        {d: needs(q) for q, d in diffs},
+        {m: muscles(q) for q, m in enumerate(cat.display)},
+        *csr("PXP"),
+        *csr("PXS"),
+    )
+    # raw sections + string table, for VectorScorer.from_catalog
+    cat.arrays = sec
+    cat.strings = strs
+    report_invalid_reps(cat.invalid_reps)
+    return cat
+
+
+def ensure_compiled(json_path: str, artifact: Optional[str] = None) -> str:
+    """
+    Path of an up-to-date artifact for `json_path`, compiling it if needed. Compiles
+    happen under a lock file, so when several workers start at once one of them
+    builds it and the rest wait, find it fresh and just map it.
+    """
+    artifact = artifact or artifact_path(json_path)
+    try:
+        check_fresh(artifact, json_path)
+        return artifact
+    except (ValueError, OSError, struct.error):
+        pass
+    os.makedirs(os.path.dirname(os.path.abspath(artifact)), exist_ok=True)
+    with locked(artifact + ".lock"):
+        try:
+            check_fresh(artifact, json_path)
+        except (ValueError, OSError, struct.error):
+            compile_catalog(json_path, artifact)
+    return artifact
+
+def load_shared(json_path: str, artifact: Optional[str] = None,
+                cache_rows: Optional[int] = None) -> ExerciseCatalog:
+    """
+    Catalog for a server running several worker processes: compiled on first use
+    (ensure_compiled) and mapped lazily, so every worker reads the same page-cache
+    pages and only holds the rows it has built. Pass cache_rows (see read_compiled)
+    to cap that per worker. Falls back to the JSON if the artifact can't be written
+    or read.
+    """
+    try:
+        return read_compiled(ensure_compiled(json_path, artifact), lazy=True, cache_rows=cache_rows)
+    except (ValueError, OSError, struct.error) as e:
+        print(f"[catalog] shared catalog unavailable ({e}); loading JSON", file=sys.stderr)
+        return ExerciseCatalog.load(json_path)
+
+
+def load_catalog(json_path: str, keep_source: bool = True, artifact: Optional[str] = None) -> ExerciseCatalog:
+    """
+    The catalog for `json_path`, from its compiled artifact when that is up to date
+    (default: artifact_path), else straight from the JSON.
+    """
+    artifact = artifact or artifact_path(json_path)
+    if os.path.exists(artifact):
+        try:
+            check_fresh(artifact, json_path)
+            return read_compiled(artifact, keep_source=keep_source)
+        except (ValueError, OSError, struct.error) as e:
+            print(f"[catalog] {e}; loading JSON (rebuild with: python compile_catalog.py {json_path})",
+                  file=sys.stderr)
+    return ExerciseCatalog.load(json_path, keep_source=keep_source)
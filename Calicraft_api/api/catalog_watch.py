@@ -0,0 +1,105 @@
+# catalog_watch.py
+"""
+Hot reload for exercises.json.
+
+A CatalogWatcher holds the current snapshot (whatever `build(path)` returns, e.g.
+the catalog plus its scorer) and a daemon thread that polls the file's size and
+mtime. When they change and then hold still for one poll, it builds a new
+snapshot off the request path and swaps it in with a single reference
+assignment: a request that read `watcher.current` keeps using that snapshot to
+the end, later requests see the new one. A file that fails to load (half-written,
+bad JSON) is logged and the old snapshot stays.
+
+Polling rather than inotify: stdlib only, works on macOS and on network mounts.
+"""
+import os
+import sys
+import threading
+import time
+from typing import Callable, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+Signature = Tuple[int, int]   # (size, mtime_ns)
+
+
+def file_signature(path: str) -> Optional[Signature]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class CatalogWatcher(Generic[T]):
+    """
+      watcher = CatalogWatcher(path, build, interval=2.0)
+      snap = watcher.current      # grab once per request
+      watcher.start() / stop()    # background polling
+      watcher.check()             # one poll (True if a new snapshot was swapped in)
+      watcher.on_swap(fn)         # fn(old, new) runs after each swap
+    """
+
+    def __init__(self, path: str, build: Callable[[str], T], interval: float = 2.0):
+        self.path = path
+        self.interval = interval
+        self._build = build
+        self._listeners: List[Callable[[T, T], None]] = []
+        self._lock = threading.Lock()   # one rebuild at a time (poller vs manual check)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signature = file_signature(path)
+        self._pending: Optional[Signature] = None
+        self.current: T = build(path)
+        self.loaded_at = time.time()
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+
+    def on_swap(self, fn: Callable[[T, T], None]) -> None:
+        self._listeners.append(fn)
+
+    def check(self) -> bool:
+        sig = file_signature(self.path)
+        if sig is None or sig == self._signature:
+            self._pending = None
+            return False
+        if sig != self._pending:
+            # changed since the last poll: let the writer finish first
+            self._pending = sig
+            return False
+        with self._lock:
+            if sig == self._signature:
+                return False
+            self._signature = sig   # a broken file is retried only once it changes again
+            try:
+                new = self._build(self.path)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"[catalog] reload of {self.path} failed, keeping the old catalog: {self.last_error}", file=sys.stderr)
+                return False
+            old, self.current = self.current, new
+            self.loaded_at = time.time()
+            self.reloads += 1
+            self.last_error = None
+        for fn in self._listeners:
+            fn(old, new)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:   # never let the poller die
+                print(f"[catalog] watcher error: {e}", file=sys.stderr)
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
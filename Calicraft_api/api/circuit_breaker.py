@@ -0,0 +1,241 @@
+# circuit_breaker.py
+"""
+Circuit breaker for an LLM backend (the local Ollama server).
+
+  closed     calls go through; the last `window` outcomes are kept, and once there
+             are at least `min_calls` of them with a failure share >= failure_rate
+             the circuit opens
+  open       allow() is False straight away (no network, no timeout) until
+             `cooldown` seconds have passed
+  half_open  one caller claims the probe and runs probe() (a cheap health check,
+             e.g. GET /api/tags with a short timeout): healthy -> closed with a
+             fresh window, else open for another cooldown. Everyone else is
+             refused while it runs, so a recovering backend sees a single request
+
+call() counts only exceptions of the `failures` types (for Ollama: requests'
+transport and HTTP errors), not a caller giving up on a slow answer. Overload is
+opt-in and separate from any caller's budget: with `slow_call` set, a call that
+took (or was abandoned after, see record_abandoned) at least that long is a failure.
+
+Each run of ollama_workout_planner.py is its own process, so the state can be
+kept in a small JSON file (`path`) that later runs pick up; it's rewritten
+atomically after every change. The half-open claim is made under a lock file
+(`path`.lock) and stored with its start time, so overlapping runs don't probe
+together; a claim older than `probe_lease` (a run that died mid-probe) lapses.
+Runs that overlap may still overwrite each other's last outcome, which only
+delays a transition by a call.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, Type
+
+from file_lock import locked
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the backend while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+      breaker = CircuitBreaker(probe=client.healthy, path="/tmp/ollama-breaker.json")
+      if breaker.allow(): ... breaker.record(ok)   # or breaker.call(fn)
+      CircuitBreaker(..., failures=(requests.RequestException,), slow_call=20.0)
+      breaker.snapshot()                          # state for monitoring / output
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], bool],
+        window: int = 20,
+        min_calls: int = 4,
+        failure_rate: float = 0.5,
+        cooldown: float = 30.0,
+        path: Optional[str] = None,
+        failures: Tuple[Type[BaseException], ...] = (Exception,),
+        slow_call: Optional[float] = None,
+        probe_lease: float = 10.0,
+    ):
+        self.probe = probe
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.path = path
+        self.failures = failures
+        self.slow_call = slow_call
+        self.probe_lease = probe_lease
+        self._lock = threading.Lock()
+        self._probing = False   # this process holds the half-open claim
+        self.state = CLOSED
+        self.outcomes: Deque[bool] = deque(maxlen=window)   # True = success
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.short_circuited = 0   # calls refused while open
+        self.probes = 0
+        self.last_error: Optional[str] = None
+        self._load()
+
+    # ---- transitions ----
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self.outcomes.clear()
+
+    def _claim_probe(self, now: float) -> Optional[bool]:
+        """
+        Under the lock file, with the state as other runs left it: None if the
+        circuit is closed again, True if this caller now holds the half-open probe,
+        False if it's still cooling down or someone else's probe is in flight.
+        """
+        with locked(self.path + ".lock") if self.path else nullcontext():
+            self._load()
+            if self.state == CLOSED:
+                return None
+            if self.state == OPEN and now - self.opened_at < self.cooldown:
+                return False
+            if self.state == HALF_OPEN and now - self.probe_started < self.probe_lease:
+                return False
+            self.state = HALF_OPEN
+            self.probe_started = now
+            self.probes += 1
+            self._save()
+            return True
+
+    def allow(self) -> bool:
+        """May a call go out now? Instant while open; one caller probes once the cooldown is over."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            claimed = False if self._probing else self._claim_probe(time.time())
+            if claimed is None:
+                return True
+            if not claimed:
+                self.short_circuited += 1
+                self._save()
+                return False
+            self._probing = True
+        # probe outside the lock: it's network I/O
+        healthy = False
+        try:
+            healthy = bool(self.probe())
+        except Exception as e:
+            self.last_error = f"probe: {type(e).__name__}: {e}"
+        with self._lock:
+            self._probing = False
+            if healthy:
+                self._close()
+            else:
+                self.last_error = self.last_error or "probe: unhealthy"
+                self._open(time.time())
+                self.short_circuited += 1
+            self._save()
+            return healthy
+
+    def record(self, ok: bool, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.outcomes.append(ok)
+            if not ok:
+                self.last_error = error
+            failures = self.outcomes.count(False)
+            if (self.state == CLOSED and len(self.outcomes) >= self.min_calls
+                    and failures / len(self.outcomes) >= self.failure_rate):
+                self._open(time.time())
+            self._save()
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """
+        fn() behind the breaker: CircuitOpenError while open. A `failures` exception
+        or a slow_call overrun counts as a failure, a return as a success; other
+        exceptions propagate without counting either way.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"circuit open ({self.last_error or 'backend failing'})")
+        started = time.monotonic()
+        try:
+            out = fn()
+        except self.failures as e:
+            self.record(False, f"{type(e).__name__}: {e}")
+            raise
+        elapsed = time.monotonic() - started
+        if self.slow_call is not None and elapsed >= self.slow_call:
+            self.record(False, f"slow call: {elapsed:.1f}s (limit {self.slow_call:g}s)")
+        else:
+            self.record(True)
+        return out
+
+    def record_abandoned(self, elapsed: float) -> None:
+        """
+        The caller stopped waiting on a call that had run `elapsed` seconds. That's
+        only a failure if slow_call is set and already passed; a budget miss alone
+        says nothing about the backend.
+        """
+        if self.slow_call is not None and elapsed >= self.slow_call:
+            self.record(False, f"slow call: still running after {elapsed:.1f}s (limit {self.slow_call:g}s)")
+
+    # ---- monitoring ----
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            n = len(self.outcomes)
+            snap = {
+                "state": self.state,
+                "failure_rate": round(self.outcomes.count(False) / n, 3) if n else 0.0,
+                "window_calls": n,
+                "short_circuited": self.short_circuited,
+                "probes": self.probes,
+                "last_error": self.last_error,
+            }
+            if self.state == HALF_OPEN:
+                snap["probe_age_s"] = round(max(0.0, time.time() - self.probe_started), 1)
+            if self.state == OPEN:
+                snap["retry_in_s"] = round(max(0.0, self.cooldown - (time.time() - self.opened_at)), 1)
+            return snap
+
+    # ---- persistence ----
+    def _load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                d = json.load(f)
+            if d["state"] not in (CLOSED, OPEN, HALF_OPEN):
+                raise ValueError(d["state"])
+            self.state = d["state"]
+            self.outcomes.clear()
+            self.outcomes.extend(bool(x) for x in d["outcomes"])
+            self.opened_at = float(d["opened_at"])
+            self.probe_started = float(d.get("probe_started", 0.0))
+            self.short_circuited = int(d.get("short_circuited", 0))
+            self.probes = int(d.get("probes", 0))
+            self.last_error = d.get("last_error")
+        except (OSError, ValueError, KeyError, TypeError):
+            pass   # no state yet (or unreadable): start closed
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        d = {
+            # a run that died mid-probe leaves half_open; its claim lapses after probe_lease
+            "state": self.state,
+            "outcomes": [int(x) for x in self.outcomes],
+            "opened_at": self.opened_at,
+            "probe_started": self.probe_started,
+            "short_circuited": self.short_circuited,
+            "probes": self.probes,
+            "last_error": self.last_error,
+        }
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(d, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass   # monitoring state only; never fail a plan over it
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Compile exercises.json into the binary catalog the planners load at startup.
+
+  python compile_catalog.py ../../Swift\ App/New\ Project/Data/exercises.json
+  python compile_catalog.py mini_exercises.json -o /tmp/mini.catalog
+  python compile_catalog.py --check mini_exercises.json   # exit 1 if stale/missing
+
+The artifact goes where the loaders look for it (catalog_bin.artifact_path: the
+user cache dir, or $CATALOG_ARTIFACT_DIR) unless -o is given; it is never written
+next to the JSON, which would ship it in the iOS app bundle. Loaders fall back to the JSON whenever it is out of date, so
+forgetting to recompile is slow, never wrong.
+"""
+import argparse
+import sys
+import time
+
+from catalog_bin import artifact_path, check_fresh, compile_catalog, read_header
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compile exercises JSON into a binary catalog artifact.")
+    ap.add_argument("json", nargs="+", help="exercises JSON file(s)")
+    ap.add_argument("-o", "--out", default=None, help="Output path (only with a single input)")
+    ap.add_argument("--check", action="store_true", help="Only report whether each artifact is up to date")
+    args = ap.parse_args()
+    if args.out and len(args.json) > 1:
+        ap.error("-o/--out needs exactly one input")
+
+    status = 0
+    for path in args.json:
+        out = args.out or artifact_path(path)
+        if args.check:
+            try:
+                check_fresh(out, path)
+                print(f"ok     {out}")
+            except (ValueError, OSError) as e:
+                print(f"stale  {e}")
+                status = 1
+            continue
+        t0 = time.perf_counter()
+        out, cat = compile_catalog(path, out)
+        ms = (time.perf_counter() - t0) * 1000
+        _, n, digest, size, _ = read_header(out)
+        print(f"wrote {out}: {n} exercises, sha256 {digest[:12]}, {ms:.1f} ms")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
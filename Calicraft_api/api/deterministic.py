@@ -4,14 +4,21 @@ Deterministic workout planner with controllable randomness (no ML).
 - Filters by focus muscles, difficulty band, and equipment.
 - Assembles blocks: warmup, skill, strength x2, accessory, cooldown.
 - Adds small randomness to selection, dose tier, and sets (seedable).
+
+All randomness goes through an `rng` argument (a random.Random; defaults to the
+global `random` module), so one seeded instance per plan makes it reproducible
+and safe to run on many threads at once.
 """
 
 import argparse
+import heapq
 import json
 import math
 import random
 import re
-from typing import Any, Dict, List, Tuple, Set
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple, Set
+
+from sampling import weighted_choice
 
 
 # -------------------- helpers --------------------
@@ -40,28 +47,59 @@ def band_to_index(band: str, n: int) -> int:
         "elite": n - 1,
     }.get(band, min(1, n - 1))
 
-def parse_reps_field(reps: str) -> Tuple[List[int], str]:
+DEFAULT_TIERS = ((8, 10, 12), "reps")
+# "<name> – <tiers>": a dash with spaces around it; "L-Sit" or "Arm-Leg" is part of the name
+REPS_NAME_SEP = re.compile(r"\s[–-]\s")
+REPS_TIER = re.compile(r"(\d+)\s*(s)?", flags=re.I)
+
+class RepsTiers(NamedTuple):
+    values: Tuple[int, ...]
+    unit: str        # "reps" or "s"
+
+def compile_reps(reps: str) -> Tuple[RepsTiers, str | None]:
     """
-    Parse reps/hold tiers from strings like:
-      "Arch Hold – 20s / 30s / 40s" -> ([20,30,40], 's')
-      "Archer Push Up – 6 / 10 / 14" -> ([6,10,14], 'reps')
+    Parse a reps field once into int tiers + unit. Both catalog formats work:
+      "Arch Hold – 20s / 30s / 40s" -> (20, 30, 40), 's'
+      "6 / 10 / 14"                 -> (6, 10, 14), 'reps'
+    Returns (tiers, problem); problem is None for a clean row, otherwise a short
+    reason, and tiers falls back to whatever parsed (or DEFAULT_TIERS).
     """
-    if not reps:
-        return [8, 10, 12], "reps"
-    parts = re.split(r"[–-]", reps, maxsplit=1)
-    rhs = parts[1] if len(parts) > 1 else parts[0]
-    tiers = [t.strip() for t in rhs.split("/") if t.strip()]
+    if not reps or not str(reps).strip():
+        return RepsTiers(*DEFAULT_TIERS), "missing reps"
+    rhs = REPS_NAME_SEP.split(str(reps))[-1]
     vals: List[int] = []
-    unit = "reps"
-    for t in tiers:
-        m = re.match(r"(\d+)\s*(s)?", t, flags=re.I)
+    units: Set[str] = set()
+    bad: List[str] = []
+    for t in (t.strip() for t in rhs.split("/")):
+        m = REPS_TIER.match(t)
         if m:
             vals.append(int(m.group(1)))
-            if m.group(2):
-                unit = "s"
+            units.add("s" if m.group(2) else "reps")
+        if t and (not m or m.end() != len(t)):
+            bad.append(t)
     if not vals:
-        return [8, 10, 12], "reps"
-    return vals, unit
+        return RepsTiers(*DEFAULT_TIERS), f"no numeric tiers in {reps!r}"
+    unit = "s" if "s" in units else "reps"
+    if bad:
+        return RepsTiers(tuple(vals), unit), f"unparsed tier(s) {bad} in {reps!r}"
+    if len(units) > 1:
+        return RepsTiers(tuple(vals), unit), f"mixed units in {reps!r}"
+    return RepsTiers(tuple(vals), unit), None
+
+def reps_tiers(ex: Dict[str, Any]) -> RepsTiers:
+    """
+    Compiled tiers for `ex`, cached on the dict under "_tiers" (ExerciseCatalog
+    fills this for every row at load, so per request this is a dict lookup).
+    """
+    tiers = ex.get("_tiers")
+    if tiers is None:
+        tiers = ex["_tiers"] = compile_reps(ex.get("reps", ""))[0]
+    return tiers
+
+def parse_reps_field(reps: str) -> Tuple[List[int], str]:
+    """compile_reps() as (list, unit), for older callers."""
+    tiers = compile_reps(reps)[0]
+    return list(tiers.values), tiers.unit
 
 def classify_movement(name: str) -> str:
     n = norm(name)
@@ -85,6 +123,45 @@ def default_notes(name: str) -> str:
     if cls == "skill": return "strict form; control"
     return "quality over speed"
 
+# pick predicates for assemble_plan, as flag masks (an exercise matches if it has all bits)
+F_HOLD   = 1 << 0  # "hold" in the name
+F_EASY   = 1 << 1  # difficulty <= 3
+F_SKILLY = 1 << 2  # skill/core movement or planche/lever/handstand
+F_BAND   = 1 << 3  # fits the difficulty band
+F_PUSH   = 1 << 4
+F_PULL   = 1 << 5
+F_ACC    = 1 << 6  # easy enough for the accessory slot
+# HOLD/SKILLY/PUSH/PULL/EASY only depend on the exercise; BAND/ACC depend on the plan's band
+
+class Features(NamedTuple):
+    """Everything derived from an exercise's name/difficulty, computed once per entry."""
+    key: str         # norm(name), for de-duping picks
+    slug: str
+    movement: str    # classify_movement()
+    flags: int       # F_* bits that don't depend on the band
+    difficulty: int
+    notes: str       # default_notes()
+
+def extract_features(ex: Dict[str, Any]) -> Features:
+    name = ex.get("name", "")
+    n = norm(name)
+    cls = classify_movement(name)
+    d = int(ex.get("difficulty", 5))
+    f = 0
+    if "hold" in n: f |= F_HOLD
+    if d <= 3: f |= F_EASY
+    if cls in ("skill", "core") or any(k in n for k in ["planche", "lever", "handstand"]): f |= F_SKILLY
+    if cls == "push": f |= F_PUSH
+    if cls == "pull": f |= F_PULL
+    return Features(n, slug(name), cls, f, d, default_notes(name))
+
+def features(ex: Dict[str, Any]) -> Features:
+    """extract_features(ex), cached on the dict under "_features" like reps_tiers()."""
+    ft = ex.get("_features")
+    if ft is None:
+        ft = ex["_features"] = extract_features(ex)
+    return ft
+
 def equipment_ok(ex: Dict[str, Any], equip_flags: Dict[str, bool]) -> bool:
     req = ex.get("equipment", [])
     return all(equip_flags.get(norm(x), True) for x in req)
@@ -97,184 +174,418 @@ def score_exercise(
 ) -> float:
     prim = sum(norm(m) in focus for m in ex.get("muscles", {}).get("primary", []))
     sec = sum(norm(m) in focus for m in ex.get("muscles", {}).get("secondary", []))
-    diff = int(ex.get("difficulty", 5))
+    ft = features(ex)
+    diff = ft.difficulty
     lo, hi = difficulty_band_to_range(band)
     center = (lo + hi) / 2
     difficulty_match = 1 - abs(center - diff) / 10  # 0..1
     equip = 1.0 if equipment_ok(ex, equip_flags) else 0.5
-    skill_bump = 0.3 if classify_movement(ex.get("name", "")) in ("skill", "core") else 0.0
+    skill_bump = 0.3 if ft.movement in ("skill", "core") else 0.0
     return 3 * prim + 1 * sec + 1.5 * difficulty_match + 1 * equip + skill_bump
 
-def choose_dose(ex: Dict[str, Any], band: str, rand: float) -> str:
-    tiers, unit = parse_reps_field(ex.get("reps", ""))
-    idx = band_to_index(band, len(tiers))
-    # small chance to nudge to an adjacent tier for variety
-    if len(tiers) > 1 and rand > 0 and random.random() < min(0.35, 0.7 * rand):
-        idx = max(0, min(len(tiers) - 1, idx + random.choice([-1, 1])))
-    val = tiers[idx]
-    return f"{val}s" if unit == "s" else f"{val} reps"
+DOSE_SECS = re.compile(r"^\s*(\d+)\s*s\s*$")
+DOSE_REPS = re.compile(r"^\s*(\d+)\s*reps\s*$", flags=re.I)
+DOSE_MINS = re.compile(r"^\s*(\d+)(?:-(\d+))?\s*m\s*$", flags=re.I)
 
-def estimate_time_per_set(dose: str, block: str) -> int:
+class Dose(NamedTuple):
     """
-    Return seconds for one set including a typical rest.
+    One prescription, kept structured through planning and trimming:
+      Dose(10, "reps") -> "10 reps",  Dose(25, "s") -> "25s",  Dose(2, "m", 3) -> "2-3m"
+    str() is the serialized form; only parse() (for legacy strings) touches a regex.
     """
-    m_s = re.match(r"^\s*(\d+)\s*s\s*$", dose)
-    m_r = re.match(r"^\s*(\d+)\s*reps\s*$", dose, flags=re.I)
-    m_m = re.match(r"^\s*(\d+)(?:-(\d+))?\s*m\s*$", dose, flags=re.I)
+    value: int
+    unit: str               # "reps" | "s" | "m"
+    hi: int | None = None   # top of a range, if any
+
+    @property
+    def upper(self) -> int:
+        return self.value if self.hi is None else self.hi
+
+    def __str__(self) -> str:
+        n = f"{self.value}-{self.hi}" if self.hi is not None and self.hi != self.value else f"{self.value}"
+        if self.unit == "reps":
+            return f"{n} reps"
+        return f"{n}{self.unit}"
+
+    @classmethod
+    def parse(cls, dose: str) -> "Dose | None":
+        """"25s", "10 reps", "2m" / "2-3m"; None if it's none of those."""
+        m = DOSE_SECS.match(dose)
+        if m:
+            return cls(int(m.group(1)), "s")
+        m = DOSE_REPS.match(dose)
+        if m:
+            return cls(int(m.group(1)), "reps")
+        m = DOSE_MINS.match(dose)
+        if m:
+            return cls(int(m.group(1)), "m", int(m.group(2)) if m.group(2) else None)
+        return None
+
+def as_dose(dose: "Dose | str") -> "Dose | None":
+    return dose if isinstance(dose, Dose) else Dose.parse(dose)
 
-    if m_s:
-        secs = int(m_s.group(1))
+def choose_dose(ex: Dict[str, Any], band: str, rand: float, rng: random.Random | None = None) -> Dose:
+    rng = rng or random
+    tiers, unit = reps_tiers(ex)
+    idx = band_to_index(band, len(tiers))
+    # small chance to nudge to an adjacent tier for variety
+    if len(tiers) > 1 and rand > 0 and rng.random() < min(0.35, 0.7 * rand):
+        idx = max(0, min(len(tiers) - 1, idx + rng.choice([-1, 1])))
+    return Dose(tiers[idx], unit)
+
+def seconds_per_set(dose: Dose | None, block: str) -> int:
+    """estimate_time_per_set for an already-structured dose."""
+    if dose is None:
+        return 60
+    if dose.unit == "s":
         rest = 60 if block == "strength" else 45 if block in ("skill", "accessory") else 15
-        return secs + rest
-    if m_r:
-        reps = int(m_r.group(1))
+        return dose.value + rest
+    if dose.unit == "reps":
         sec_per_rep = 3.0 if block == "strength" else 2.5
         rest = 75 if block == "strength" else 45
-        return int(reps * sec_per_rep + rest)
-    if m_m:
-        lo = int(m_m.group(1)); hi = int(m_m.group(2) or lo)
-        return int(((lo + hi) / 2) * 60)
-    return 60
+        return int(dose.value * sec_per_rep + rest)
+    return int(((dose.value + dose.upper) / 2) * 60)
+
+def estimate_time_per_set(dose: Dose | str, block: str) -> int:
+    """
+    Return seconds for one set including a typical rest.
+    """
+    return seconds_per_set(as_dose(dose), block)
 
 def fits_band(ex: Dict[str, Any], band: str) -> bool:
     lo, hi = difficulty_band_to_range(band)
     return lo <= int(ex.get("difficulty", 5)) <= hi
 
 def sample_from_top(
-    scored: List[Tuple[Dict[str, Any], float]],
+    scored: Iterable[Tuple[Dict[str, Any], float]],
     taken: Set[str],
     pred,
-    top_k: int
+    top_k: int,
+    rng: random.Random | None = None,
+    temperature: float | None = None,
 ) -> Dict[str, Any] | None:
-    pool = [(e, s) for (e, s) in scored if pred(e) and norm(e["name"]) not in taken]
+    """
+    One of the first top_k untaken matches of `pred`: uniform, or score-weighted
+    (P ∝ exp(score / temperature), see sampling) if a temperature is given.
+    """
+    rng = rng or random
+    # only the first top_k matches can be picked, so stop reading there
+    # (with a LazyRanking that also means we never sort deeper than needed)
+    pool = []
+    for (e, s) in scored:
+        if pred(e) and norm(e["name"]) not in taken:
+            pool.append((e, s))
+            if len(pool) >= top_k:
+                break
     if not pool:
         return None
+    if temperature is not None:
+        return weighted_choice(pool, temperature, rng)
     k = min(top_k, len(pool))
     # bias toward higher scores but allow exploration
-    idx = random.randrange(k)
+    idx = rng.randrange(k)
     return pool[idx][0]
 
 
 # -------------------- planner --------------------
 
-def rank_candidates(
+class LazyRanking:
+    """
+    Best-first view over unsorted (exercise, score) pairs that only sorts as far
+    as it is read: heapify is O(n), each item after that O(log n). Items read
+    once are kept, so it can be iterated and indexed repeatedly. Ties come out
+    in input order, like a stable sort.
+    """
+
+    def __init__(self, scored: List[Tuple[Dict[str, Any], float]]):
+        # (−score, input position, exercise): position breaks ties and keeps dicts from being compared
+        self._heap = [(-s, i, e) for i, (e, s) in enumerate(scored)]
+        heapq.heapify(self._heap)
+        self._ranked: List[Tuple[Dict[str, Any], float]] = []
+
+    def _pull(self) -> bool:
+        if not self._heap:
+            return False
+        neg, _, e = heapq.heappop(self._heap)
+        self._ranked.append((e, -neg))
+        return True
+
+    def __len__(self) -> int:
+        return len(self._ranked) + len(self._heap)
+
+    def __iter__(self) -> Iterator[Tuple[Dict[str, Any], float]]:
+        i = 0
+        while i < len(self._ranked) or self._pull():
+            yield self._ranked[i]
+            i += 1
+
+    def _fill(self, n: int) -> None:
+        while len(self._ranked) < n and self._pull():
+            pass
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            neg = any(x is not None and x < 0 for x in (i.start, i.stop))
+            self._fill(len(self) if neg or i.stop is None else i.stop)
+        else:
+            self._fill(len(self) if i < 0 else i + 1)
+        return self._ranked[i]
+
+def top_k(scored: Iterable[Tuple[Dict[str, Any], float]], k: int) -> List[Tuple[Dict[str, Any], float]]:
+    """The k best by score, O(n log k); identical to sorting (stable, reverse) and slicing."""
+    return heapq.nlargest(k, scored, key=lambda x: x[1])
+
+def score_candidates(
     all_exercises: List[Dict[str, Any]],
     focus_muscles: List[str],
     band: str,
     equipment_flags: Dict[str, bool],
-    rand: float
 ) -> List[Tuple[Dict[str, Any], float]]:
+    """score_exercise for every exercise the equipment allows, in input order (no jitter, no sort)."""
     focus = {norm(m) for m in focus_muscles}
-    scored: List[Tuple[Dict[str, Any], float]] = []
-    for e in all_exercises:
-        if not equipment_ok(e, equipment_flags):
-            continue
-        s = score_exercise(e, focus, band, equipment_flags)
-        # small random jitter to break ties / add variety
-        if rand > 0:
-            s += random.uniform(-0.4, 0.4) * rand
-        scored.append((e, s))
+    return [
+        (e, score_exercise(e, focus, band, equipment_flags))
+        for e in all_exercises if equipment_ok(e, equipment_flags)
+    ]
+
+def rank_candidates(
+    all_exercises: List[Dict[str, Any]],
+    focus_muscles: List[str],
+    band: str,
+    equipment_flags: Dict[str, bool],
+    rand: float,
+    rng: random.Random | None = None,
+    k: int | None = None,
+    lazy: bool = False,
+) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    Score + jitter every exercise, best first.
+      k=N       -> only the N best (heap selection instead of a full sort)
+      lazy=True -> a LazyRanking that sorts only as deep as the caller reads
+    """
+    rng = rng or random
+    scored = score_candidates(all_exercises, focus_muscles, band, equipment_flags)
+    # small random jitter to break ties / add variety
+    if rand > 0:
+        scored = [(e, s + rng.uniform(-0.4, 0.4) * rand) for e, s in scored]
+    if k is not None:
+        return top_k(scored, k)
+    if lazy:
+        return LazyRanking(scored)
     scored.sort(key=lambda x: x[1], reverse=True)
     return scored
 
-def build_block_item(ex: Dict[str, Any], band: str, sets: int, block_name: str, rand: float) -> Dict[str, Any]:
+def build_block_item(
+    ex: Dict[str, Any], band: str, sets: int, block_name: str, rand: float,
+    rng: random.Random | None = None,
+) -> Dict[str, Any]:
+    rng = rng or random
     if block_name == "warmup":
-        dur = 2 if rand == 0 else random.choice([1, 2, 3])
-        dose = f"{dur}m"
+        dur = 2 if rand == 0 else rng.choice([1, 2, 3])
+        dose = Dose(dur, "m")
     elif block_name == "cooldown":
-        dur = 3 if rand == 0 else random.choice([2, 3, 4])
-        dose = f"{dur}m"
+        dur = 3 if rand == 0 else rng.choice([2, 3, 4])
+        dose = Dose(dur, "m")
     else:
-        dose = choose_dose(ex, band, rand)
+        dose = choose_dose(ex, band, rand, rng=rng)
 
     # small set jitter (±1) except warmup/cooldown
-    if rand > 0 and block_name not in ("warmup", "cooldown") and random.random() < min(0.45, 0.9 * rand):
-        sets = max(1, sets + random.choice([-1, 0, 1]))
+    if rand > 0 and block_name not in ("warmup", "cooldown") and rng.random() < min(0.45, 0.9 * rand):
+        sets = max(1, sets + rng.choice([-1, 0, 1]))
 
+    ft = features(ex)
     item = {
-        "id": slug(ex["name"]),
+        "id": ft.slug,
         "name": ex["name"],
         "sets": sets,
         "dose": dose,
-        "notes": default_notes(ex["name"]),
+        "notes": ft.notes,
     }
     reqs = ex.get("requiredSkills", [])
     if reqs:
         item["notes"] += f"; prereq: {', '.join(reqs)}"
     return item
 
+PICKS = (
+    F_HOLD | F_EASY, F_EASY,
+    F_SKILLY | F_BAND, F_SKILLY, F_BAND,
+    F_PUSH | F_BAND, F_PULL | F_BAND,
+    F_ACC, 0,
+)
+
+class CandidatePool:
+    """
+    Ranked candidates for one plan, classified once.
+
+    Each exercise's flags (its precomputed Features bits plus the band-relative
+    ones) are combined the first time it is read from `scored`,
+    and its position is appended to the index list of every pick it matches.
+    Taken names are a bitmap. pick() walks one index list, so a block pick costs
+    about O(top_k) instead of re-filtering the whole ranking. It is the same
+    choice as sample_from_top with the equivalent predicate, with the same RNG draw
+    (including the score-weighted one when a temperature is given).
+    `scored` is read lazily, so a LazyRanking is only sorted as deep as the picks go.
+    """
+
+    def __init__(
+        self,
+        scored: Iterable[Tuple[Dict[str, Any], float]],
+        band: str,
+        temperature: float | None = None,
+    ):
+        self._stream = iter(scored)
+        self._band = difficulty_band_to_range(band)
+        self._acc_max = max(self._band[0] + 1, 4)
+        self.temperature = temperature
+        self.items: List[Dict[str, Any]] = []
+        self.scores: List[float] = []
+        self._name_of: List[int] = []      # position -> name id
+        self._name_ids: Dict[str, int] = {}
+        self._taken = bytearray()           # name id -> 1 if taken
+        self._pos: Dict[int, int] = {}      # id(exercise) -> position
+        self._lists: Dict[int, List[int]] = {m: [] for m in PICKS}
+        self._start: Dict[int, int] = {m: 0 for m in PICKS}
+
+    def _flags(self, ft: Features) -> int:
+        # static bits come precomputed; only the band-relative ones are added here
+        d = ft.difficulty
+        lo, hi = self._band
+        f = ft.flags
+        if lo <= d <= hi: f |= F_BAND
+        if d <= self._acc_max: f |= F_ACC
+        return f
+
+    def _pull(self) -> bool:
+        try:
+            e, s = next(self._stream)
+        except StopIteration:
+            return False
+        p = len(self.items)
+        self.items.append(e)
+        self.scores.append(s)
+        self._pos[id(e)] = p
+        ft = features(e)
+        name = ft.key
+        if name not in self._name_ids:
+            self._name_ids[name] = len(self._name_ids)
+            self._taken.append(0)
+        self._name_of.append(self._name_ids[name])
+        f = self._flags(ft)
+        for m, lst in self._lists.items():
+            if f & m == m:
+                lst.append(p)
+        return True
+
+    def first(self) -> Dict[str, Any] | None:
+        if not self.items and not self._pull():
+            return None
+        return self.items[0]
+
+    def take(self, ex: Dict[str, Any]) -> None:
+        self._taken[self._name_of[self._pos[id(ex)]]] = 1
+
+    def pick(self, mask: int, top_k: int, rng) -> Dict[str, Any] | None:
+        """Pick among the first top_k untaken matches of `mask` (a PICKS entry), as sample_from_top."""
+        lst = self._lists[mask]
+        taken = self._taken
+        j = self._start[mask]
+        # a taken prefix stays taken, so skip it for good
+        while j < len(lst) and taken[self._name_of[lst[j]]]:
+            j += 1
+        self._start[mask] = j
+        pool: List[int] = []
+        while len(pool) < top_k:
+            if j == len(lst):
+                if not self._pull():
+                    break
+                continue
+            p = lst[j]
+            j += 1
+            if not taken[self._name_of[p]]:
+                pool.append(p)
+        if not pool:
+            return None
+        if self.temperature is not None:
+            return self.items[weighted_choice([(p, self.scores[p]) for p in pool], self.temperature, rng)]
+        # bias toward higher scores but allow exploration
+        return self.items[pool[rng.randrange(len(pool))]]
+
 def assemble_plan(
-    scored: List[Tuple[Dict[str, Any], float]],
+    scored: Iterable[Tuple[Dict[str, Any], float]],
     minutes: int,
     band: str,
     top_k: int,
-    rand: float
+    rand: float,
+    rng: random.Random | None = None,
+    temperature: float | None = None,
 ) -> Dict[str, Any]:
-    taken: Set[str] = set()
+    """temperature: None = uniform picks among the top_k, else score-weighted (see sampling)."""
+    rng = rng or random
+    pool = CandidatePool(scored, band, temperature)
     blocks: List[Dict[str, Any]] = []
 
-    def is_hold(e): return "hold" in norm(e["name"])
-    def is_skilly(e): return classify_movement(e["name"]) in ("skill", "core") or any(k in norm(e["name"]) for k in ["planche","lever","handstand"])
-    def is_push(e): return classify_movement(e["name"]) == "push"
-    def is_pull(e): return classify_movement(e["name"]) == "pull"
-
     # WARMUP
-    warmup = (sample_from_top(scored, taken, lambda e: is_hold(e) and int(e.get("difficulty", 5)) <= 3, top_k)
-              or sample_from_top(scored, taken, lambda e: int(e.get("difficulty", 5)) <= 3, top_k)
-              or scored[0][0])
-    taken.add(norm(warmup["name"]))
-    blocks.append({"name": "warmup", "items": [build_block_item(warmup, band, sets=1, block_name="warmup", rand=rand)]})
+    warmup = (pool.pick(F_HOLD | F_EASY, top_k, rng)
+              or pool.pick(F_EASY, top_k, rng)
+              or pool.first())
+    pool.take(warmup)
+    blocks.append({"name": "warmup", "items": [build_block_item(warmup, band, sets=1, block_name="warmup", rand=rand, rng=rng)]})
 
     # SKILL
-    skill = (sample_from_top(scored, taken, lambda e: is_skilly(e) and fits_band(e, band), top_k)
-             or sample_from_top(scored, taken, lambda e: is_skilly(e), top_k)
-             or sample_from_top(scored, taken, lambda e: fits_band(e, band), top_k))
+    skill = (pool.pick(F_SKILLY | F_BAND, top_k, rng)
+             or pool.pick(F_SKILLY, top_k, rng)
+             or pool.pick(F_BAND, top_k, rng))
     if skill:
-        taken.add(norm(skill["name"]))
-        blocks.append({"name": "skill", "items": [build_block_item(skill, band, sets=3, block_name="skill", rand=rand)]})
+        pool.take(skill)
+        blocks.append({"name": "skill", "items": [build_block_item(skill, band, sets=3, block_name="skill", rand=rand, rng=rng)]})
 
     # STRENGTH (try push + pull)
     strength_items: List[Dict[str, Any]] = []
-    push = sample_from_top(scored, taken, lambda e: is_push(e) and fits_band(e, band), top_k)
+    push = pool.pick(F_PUSH | F_BAND, top_k, rng)
     if push:
-        taken.add(norm(push["name"]))
-        strength_items.append(build_block_item(push, band, sets=3, block_name="strength", rand=rand))
-    pull = sample_from_top(scored, taken, lambda e: is_pull(e) and fits_band(e, band), top_k)
+        pool.take(push)
+        strength_items.append(build_block_item(push, band, sets=3, block_name="strength", rand=rand, rng=rng))
+    pull = pool.pick(F_PULL | F_BAND, top_k, rng)
     if pull:
-        taken.add(norm(pull["name"]))
-        strength_items.append(build_block_item(pull, band, sets=3, block_name="strength", rand=rand))
+        pool.take(pull)
+        strength_items.append(build_block_item(pull, band, sets=3, block_name="strength", rand=rand, rng=rng))
     if len(strength_items) < 2:
-        extra = sample_from_top(scored, taken, lambda e: fits_band(e, band), top_k)
+        extra = pool.pick(F_BAND, top_k, rng)
         if extra:
-            taken.add(norm(extra["name"]))
-            strength_items.append(build_block_item(extra, band, sets=3, block_name="strength", rand=rand))
+            pool.take(extra)
+            strength_items.append(build_block_item(extra, band, sets=3, block_name="strength", rand=rand, rng=rng))
     if strength_items:
         # optional tiny shuffle
-        if rand > 0 and random.random() < min(0.35, 0.7 * rand):
-            random.shuffle(strength_items)
+        if rand > 0 and rng.random() < min(0.35, 0.7 * rand):
+            rng.shuffle(strength_items)
         blocks.append({"name": "strength", "items": strength_items})
 
     # ACCESSORY
-    accessory = (sample_from_top(
-        scored, taken,
-        lambda e: int(e.get("difficulty", 5)) <= max(difficulty_band_to_range(band)[0] + 1, 4),
-        top_k
-    ) or sample_from_top(scored, taken, lambda e: True, top_k))
+    accessory = pool.pick(F_ACC, top_k, rng) or pool.pick(0, top_k, rng)
     if accessory:
-        taken.add(norm(accessory["name"]))
-        blocks.append({"name": "accessory", "items": [build_block_item(accessory, band, sets=2, block_name="accessory", rand=rand)]})
+        pool.take(accessory)
+        blocks.append({"name": "accessory", "items": [build_block_item(accessory, band, sets=2, block_name="accessory", rand=rand, rng=rng)]})
 
     # COOLDOWN
-    cooldown = (sample_from_top(scored, taken, lambda e: is_hold(e) and int(e.get("difficulty", 5)) <= 3, top_k)
-                or warmup)
+    cooldown = pool.pick(F_HOLD | F_EASY, top_k, rng) or warmup
     if cooldown:
-        taken.add(norm(cooldown["name"]))
-        blocks.append({"name": "cooldown", "items": [build_block_item(cooldown, band, sets=1, block_name="cooldown", rand=rand)]})
+        pool.take(cooldown)
+        blocks.append({"name": "cooldown", "items": [build_block_item(cooldown, band, sets=1, block_name="cooldown", rand=rand, rng=rng)]})
 
     plan = {"minutes": minutes, "blocks": blocks}
     trim_to_time_budget(plan)
     return plan
 
+def serialize_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-ready copy of a plan: Dose values become their "10 reps" / "25s" strings."""
+    return {
+        **plan,
+        "blocks": [
+            {**block, "items": [{**it, "dose": str(it["dose"])} for it in block["items"]]}
+            for block in plan["blocks"]
+        ],
+    }
+
 def total_plan_seconds(plan: Dict[str, Any]) -> int:
     secs = 0
     for block in plan["blocks"]:
@@ -284,44 +595,89 @@ def total_plan_seconds(plan: Dict[str, Any]) -> int:
             secs += per * int(it["sets"])
     return secs
 
+class TimeBudget:
+    """
+    Running time total for a plan. Every item's Dose (strings are parsed once)
+    and its seconds-per-set are cached. drop_set() and shrink_dose() update the total in O(1),
+    so trimming never re-parses or re-sums the plan.
+    """
+
+    TRIM_ORDER = ("accessory", "strength", "skill")
+
+    def __init__(self, plan: Dict[str, Any]):
+        self.rows: List[Dict[str, Any]] = []  # items in plan order
+        self.dose: List[Dose | None] = []
+        self.per_set: List[int] = []
+        self.block: List[str] = []
+        # where trim_to_time_budget looks for a set to drop: per block name, the
+        # matching blocks in plan order with their items last-to-first
+        self.drop_order: Dict[str, List[int]] = {b: [] for b in self.TRIM_ORDER}
+        self.total = 0
+        for block in plan["blocks"]:
+            first = len(self.rows)
+            for it in block["items"]:
+                dose = as_dose(it["dose"])
+                per = seconds_per_set(dose, block["name"])
+                self.rows.append(it)
+                self.dose.append(dose)
+                self.per_set.append(per)
+                self.block.append(block["name"])
+                self.total += per * int(it["sets"])
+            if block["name"] in self.drop_order:
+                self.drop_order[block["name"]].extend(range(len(self.rows) - 1, first - 1, -1))
+        # sets and doses only ever go down, so both searches can resume where they stopped
+        self._drop_cursor = {b: 0 for b in self.TRIM_ORDER}
+        self._shrink_cursor = 0
+
+    def drop_set(self) -> bool:
+        """Take one set off the first item (in trim order) that has more than one."""
+        for bname in self.TRIM_ORDER:
+            order = self.drop_order[bname]
+            j = self._drop_cursor[bname]
+            while j < len(order) and not self.rows[order[j]]["sets"] > 1:
+                j += 1
+            self._drop_cursor[bname] = j
+            if j < len(order):
+                r = order[j]
+                self.rows[r]["sets"] -= 1
+                self.total -= self.per_set[r]
+                return True
+        return False
+
+    def _shrunk(self, r: int) -> Dose | None:
+        dose = self.dose[r]
+        if dose is None:
+            return None
+        if dose.unit == "s" and dose.value > 20:
+            return Dose(max(15, int(dose.value * 0.7)), "s")
+        if dose.unit == "reps" and dose.value > 6:
+            return Dose(max(5, int(math.ceil(dose.value * 0.8))), "reps")
+        return None
+
+    def shrink_dose(self) -> bool:
+        """Shorten the first hold > 20s or rep count > 6, in plan order."""
+        r = self._shrink_cursor
+        while r < len(self.rows):
+            new = self._shrunk(r)
+            if new is not None:
+                it = self.rows[r]
+                it["dose"] = new
+                per = seconds_per_set(new, self.block[r])
+                self.total += (per - self.per_set[r]) * int(it["sets"])
+                self.dose[r] = new
+                self.per_set[r] = per
+                self._shrink_cursor = r
+                return True
+            r += 1
+        self._shrink_cursor = r
+        return False
+
 def trim_to_time_budget(plan: Dict[str, Any]) -> None:
     budget = plan["minutes"] * 60
-    order = ["accessory", "strength", "skill"]
-    while total_plan_seconds(plan) > budget:
-        trimmed = False
-        for bname in order:
-            for block in plan["blocks"]:
-                if block["name"] != bname:
-                    continue
-                for it in reversed(block["items"]):
-                    if it["sets"] > 1:
-                        it["sets"] -= 1
-                        trimmed = True
-                        break
-                if trimmed:
-                    break
-            if trimmed:
-                break
-        if not trimmed:
-            for block in plan["blocks"]:
-                for it in block["items"]:
-                    m_s = re.match(r"^\s*(\d+)\s*s\s*$", it["dose"])
-                    m_r = re.match(r"^\s*(\d+)\s*reps\s*$", it["dose"], flags=re.I)
-                    if m_s:
-                        val = int(m_s.group(1))
-                        if val > 20:
-                            it["dose"] = f"{max(15, int(val * 0.7))}s"
-                            trimmed = True
-                            break
-                    elif m_r:
-                        val = int(m_r.group(1))
-                        if val > 6:
-                            it["dose"] = f"{max(5, int(math.ceil(val * 0.8)))} reps"
-                            trimmed = True
-                            break
-                if trimmed:
-                    break
-        if not trimmed:
+    tb = TimeBudget(plan)
+    # drop sets (accessory, then strength, then skill) first, then shorten doses
+    while tb.total > budget:
+        if not (tb.drop_set() or tb.shrink_dose()):
             break
 
 
@@ -337,29 +693,39 @@ def main():
     ap.add_argument("--out", default="plan.json", help="Where to write the plan JSON")
     ap.add_argument("--rand", type=float, default=0.20, help="Randomness level (0..1). 0 = fully deterministic.")
     ap.add_argument("--topk", type=int, default=6, help="Sample from top-K candidates per pick")
+    ap.add_argument("--temperature", type=float, default=None,
+                    help="Weight picks among the top-K by exp(score / T) instead of uniformly (lower = greedier)")
     ap.add_argument("--seed", type=int, default=None, help="Random seed (same seed -> same plan)")
+    ap.add_argument("--scorer", default="python", choices=["python", "numpy"],
+                    help="python = score_exercise loop, numpy = vectorized (same ranking, needs numpy)")
     args = ap.parse_args()
 
-    if args.seed is not None:
-        random.seed(args.seed)
+    rng = random.Random(args.seed)
 
-    with open(args.exercises, "r", encoding="utf-8") as f:
-        all_exercises = json.load(f)
+    # the catalog modules import this one, so not at the top. The catalog has already
+    # compiled every reps field and name (and reported malformed rows)
+    from catalog_bin import load_catalog
+    all_exercises = load_catalog(args.exercises).exercises
 
     focus_muscles = [s.strip() for s in args.focus.split(",") if s.strip()]
     equipment_list = [s.strip().lower() for s in args.equipment.split(",") if s.strip()]
     equipment_flags = {e: True for e in equipment_list}
 
-    scored = rank_candidates(
-        all_exercises, focus_muscles, args.band, equipment_flags, rand=args.rand
-    )
+    if args.scorer == "numpy":
+        from vectorized import VectorScorer
+        scored = VectorScorer(all_exercises).rank(focus_muscles, args.band, equipment_flags, rand=args.rand, rng=rng)
+    else:
+        scored = rank_candidates(
+            all_exercises, focus_muscles, args.band, equipment_flags, rand=args.rand, rng=rng, lazy=True
+        )
     if not scored:
         raise SystemExit("No exercises matched your filters/equipment. Add more items or loosen filters.")
 
-    plan = assemble_plan(scored, minutes=args.minutes, band=args.band, top_k=args.topk, rand=args.rand)
+    plan = assemble_plan(scored, minutes=args.minutes, band=args.band, top_k=args.topk, rand=args.rand, rng=rng,
+                         temperature=args.temperature)
 
     with open(args.out, "w", encoding="utf-8") as f:
-        json.dump(plan, f, ensure_ascii=False, indent=2)
+        json.dump(serialize_plan(plan), f, ensure_ascii=False, indent=2)
 
     # pretty print summary
     total_min = total_plan_seconds(plan) // 60
@@ -0,0 +1,120 @@
+# diversity.py
+"""
+Maximal-marginal-relevance (MMR) picking over muscle-overlap similarity.
+
+Similarity between two exercises is the cosine of their muscle vectors, weighted
+per tier with catalog.TIER_WEIGHTS (the weights behind catalog.tier_scores, which
+is also what planners pass as relevance), blended half and half with "same movement pattern" (push/pull/legs/
+core/skill, from classify_movement). Muscles alone miss that a row and a curl
+are both pulls; the movement term is what gets push/pull/legs spread. Each
+exercise's unit vector is computed once per catalog and kept
+(catalog.similarity); a shortlist's pairwise matrix is built from those on
+demand, since a catalog-wide n × n matrix stops fitting in memory past a few
+thousand exercises.
+
+mmr() then repeatedly takes the candidate with the best
+    lam * relevance - (1 - lam) * (max similarity to anything already taken)
+keeping a running max per candidate, so picking k of n costs O(k·n).
+diversify() is that applied to a catalog shortlist: the planners' heuristic plan.
+"""
+import math
+from typing import Any, Dict, List, Mapping, Sequence, Set, TypeVar
+
+from records import TIER_NAMES, ExerciseRecord
+
+T = TypeVar("T")
+MOVEMENT_WEIGHT = 0.5            # share of the similarity that is "same movement pattern"
+
+class MuscleSimilarity:
+    """Tier-weighted muscle cosine blended with same-movement; one unit vector per exercise, kept."""
+
+    def __init__(self, tier_weights: Mapping[str, float], movement_weight: float = MOVEMENT_WEIGHT):
+        self.tier_weights = tier_weights   # catalog.TIER_WEIGHTS (catalog imports this module)
+        self.movement_weight = movement_weight
+        self._profiles: Dict[int, Dict[int, float]] = {}
+
+    def _unit(self, ex: ExerciseRecord) -> Dict[int, float]:
+        v: Dict[int, float] = {}
+        for tier in TIER_NAMES:
+            w = self.tier_weights[tier]
+            for m in getattr(ex, tier):
+                # a muscle listed in two tiers counts at its heavier weight
+                v[m] = max(v.get(m, 0.0), w)
+        size = math.sqrt(sum(x * x for x in v.values()))
+        return {m: x / size for m, x in v.items()} if size else {}
+
+    def profile(self, ex: ExerciseRecord) -> Dict[int, float]:
+        if ex.id < 0:
+            return self._unit(ex)
+        p = self._profiles.get(ex.id)
+        if p is None:
+            p = self._profiles[ex.id] = self._unit(ex)
+        return p
+
+    def matrix(self, pool: Sequence[ExerciseRecord]) -> List[List[float]]:
+        """Pairwise similarities of `pool` (symmetric, 1.0 on the diagonal for anything with muscles)."""
+        vecs = [self.profile(ex) for ex in pool]
+        moves = [ex.features.movement for ex in pool]
+        w = self.movement_weight
+        n = len(vecs)
+        sim = [[0.0] * n for _ in range(n)]
+        for a in range(n):
+            va = vecs[a]
+            for b in range(a, n):
+                vb = vecs[b]
+                if len(vb) < len(va):
+                    s = sum(x * va.get(m, 0.0) for m, x in vb.items())
+                else:
+                    s = sum(x * vb.get(m, 0.0) for m, x in va.items())
+                sim[a][b] = sim[b][a] = (1 - w) * s + w * (moves[a] == moves[b])
+        return sim
+
+def mmr(
+    candidates: Sequence[T],
+    relevance: Sequence[float],
+    similarity: Sequence[Sequence[float]],
+    k: int,
+    lam: float = 0.5,
+) -> List[T]:
+    """
+    k of `candidates` in pick order. relevance is scaled to [0, 1] by its max;
+    lam = 1 is plain relevance order, lower values trade relevance for spread.
+    Ties go to the earlier candidate.
+    """
+    n = len(candidates)
+    k = min(k, n)
+    top = max(relevance, default=0) or 1.0
+    gain = [lam * r / top for r in relevance]
+    closest = [0.0] * n          # max similarity to the picks so far
+    taken: Set[int] = set()
+    order: List[int] = []
+    for _ in range(k):
+        best, best_val = -1, -math.inf
+        for j in range(n):
+            if j in taken:
+                continue
+            v = gain[j] - (1 - lam) * closest[j]
+            if v > best_val:
+                best, best_val = j, v
+        taken.add(best)
+        order.append(best)
+        row = similarity[best]
+        for j in range(n):
+            if row[j] > closest[j]:
+                closest[j] = row[j]
+    return [candidates[j] for j in order]
+
+def diversify(catalog: Any, candidates: Sequence[ExerciseRecord], k: int, targets: Set[str],
+              lam: float = 0.5) -> List[ExerciseRecord]:
+    """
+    The heuristic plan: k of a shortlist of `catalog` records (an ExerciseCatalog),
+    by mmr() with relevance = catalog.tier_scores(targets) and catalog.similarity.
+
+    It costs milliseconds, so the LLM planners (Data/app.py, ollama_workout_planner.py)
+    hedge with it: the model call starts first, this plan is built while it runs, and
+    the model's plan is served only if it arrives within the latency budget. The
+    planner's latency is then bounded by the budget rather than by the model.
+    """
+    scores = catalog.tier_scores(targets)
+    relevance = [scores.get(ex.id, 0) for ex in candidates]
+    return mmr(candidates, relevance, catalog.similarity.matrix(candidates), k, lam)
@@ -0,0 +1,26 @@
+# file_lock.py
+"""
+Cross-process mutual exclusion through an advisory lock file (fcntl.flock).
+Used by catalog_bin (one worker compiles the artifact, the rest wait) and
+circuit_breaker (one CLI run claims the half-open probe).
+"""
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, callers just aren't serialized
+    fcntl = None
+
+
+@contextmanager
+def locked(path: str) -> Iterator[None]:
+    """Exclusive advisory lock on `path`, created if missing (a no-op where fcntl doesn't exist)."""
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -76,7 +76,7 @@ def compress_for_prompt(exs):
             "diff": e.get("difficulty", 5),
             "primary": [m.lower() for m in e["muscles"].get("primary", [])],
             "secondary": [m.lower() for m in e["muscles"].get("secondary", [])],
-            "reps": short_reps(e.get("reps", "")),
+            "reps": short_reps(e.get("reps") or ""),
             "req": e.get("requiredSkills", []),
             "equip": e.get("equipment", []),
         })
@@ -117,8 +117,8 @@ def main():
     ap.add_argument("--deterministic", action="store_true")
     args = ap.parse_args()
 
-    with open(args.exercises, "r", encoding="utf-8") as f:
-        all_exercises = json.load(f)
+    from catalog_bin import load_catalog
+    all_exercises = load_catalog(args.exercises).exercises
 
     focus_muscles = [s.strip().lower() for s in args.focus.split(",") if s.strip()]
     equipment_list = [s.strip().lower() for s in args.equipment.split(",") if s.strip()]
@@ -16,14 +16,27 @@ Usage examples:
 """
 
 import argparse
+import heapq
 import json
 import os
 import re
 import sys
-from typing import List, Dict, Tuple, Set
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Generic, List, Dict, Optional, Tuple, Set, TypeVar
 import requests
+from requests.adapters import HTTPAdapter
 
-# ----------------------- Data models (dict-based) -----------------------
+from catalog import ExerciseCatalog
+from catalog_bin import load_catalog as load_compiled
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from diversity import diversify
+from records import MUSCLES, ExerciseRecord
+
+T = TypeVar("T")
+
+# ----------------------- Data models (records) -----------------------
 
 def canon(s: str) -> str:
     return s.strip().lower()
@@ -31,97 +44,119 @@ def canon(s: str) -> str:
 def normalize_name(s: str) -> str:
     return (s or "").lower().replace("–", "-").replace("’", "'").replace(" push ups", " push up").strip()
 
-def load_exercises(path: str) -> List[Dict]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    # minimal validation
-    for ex in data:
-        ex.setdefault("reps", None)
-        ex.setdefault("requiredSkills", [])
-        # muscles must exist
-        ex["muscles"].setdefault("primary", [])
-        ex["muscles"].setdefault("secondary", [])
-        ex["muscles"].setdefault("tertiary", [])
-    return data
-
-def compatibility_score(ex: Dict, targets: Set[str]) -> int:
-    prim = {canon(m) for m in ex["muscles"]["primary"]}
-    sec  = {canon(m) for m in ex["muscles"]["secondary"]}
-    ter  = {canon(m) for m in ex["muscles"]["tertiary"]}
-    s = 0
-    s += 3 * len(prim & targets)
-    s += 2 * len(sec & targets)
-    s += 1 * len(ter & targets)
-    return s
-
-def shortlist(exercises: List[Dict], targets: Set[str], min_diff: int, max_diff: int,
-              gate_by_skills: bool, user_skills: Set[str], top_k: int = 40) -> List[Dict]:
-    filtered = []
-    for ex in exercises:
-        if not (min_diff <= int(ex.get("difficulty", 0)) <= max_diff):
-            continue
-        if gate_by_skills:
-            req = {canon(s) for s in ex.get("requiredSkills", [])}
-            if not req.issubset(user_skills):
-                continue
-        filtered.append(ex)
-
-    scored = [(ex, compatibility_score(ex, targets)) for ex in filtered]
-    scored = [t for t in scored if t[1] > 0]
-    scored.sort(key=lambda t: (t[1], int(t[0].get("difficulty", 0)), t[0]["name"].lower()), reverse=True)
-    return [ex for ex, _ in scored[:top_k]]
-
-def diversify(candidates: List[Dict], k: int) -> List[Dict]:
-    """Heuristic fallback: avoid consecutive same first-listed primary muscle."""
-    chosen = []
-    last_primary = None
-    for ex in candidates:
-        prims = ex["muscles"]["primary"]
-        top = prims[0].lower() if prims else ex["name"].lower()
-        if last_primary and top == last_primary:
-            continue
-        chosen.append(ex)
-        last_primary = top
-        if len(chosen) >= k:
-            break
-    # fill if short
-    if len(chosen) < k:
-        for ex in candidates:
-            if ex not in chosen:
-                chosen.append(ex)
-                if len(chosen) >= k:
-                    break
-    return chosen[:k]
-
-def make_focus_scores(plan: List[Dict], targets: Set[str]) -> Dict[str, int]:
+def load_catalog(path: str) -> ExerciseCatalog:
+    # records only: the planner never needs the raw JSON dicts after load
+    return load_compiled(path, keep_source=False)
+
+def shortlist(catalog: ExerciseCatalog, targets: Set[str], min_diff: int, max_diff: int,
+              gate_by_skills: bool, user_skills: Set[str], top_k: int = 40) -> List[ExerciseRecord]:
+    # difficulty / target / prerequisite filter from the catalog's bitset index, then
+    # compatibility (3/2/1 per primary/secondary/tertiary hit) from the muscle postings
+    unlocked = catalog.skills.unlocked_mask(user_skills) if gate_by_skills else None
+    scores = catalog.tier_scores(targets)
+    scored = [(catalog.records[i], scores[i])
+              for i in catalog.filter(min_diff, max_diff, targets, unlocked) if i in scores]
+
+    # heap selection of the top_k (same result as a stable reverse sort + slice)
+    return [ex for ex, _ in heapq.nlargest(top_k, scored, key=lambda t: (t[1], t[0].difficulty, t[0].name.lower()))]
+
+def make_focus_scores(plan: List[ExerciseRecord], targets: Set[str]) -> Dict[str, int]:
     scores: Dict[str, int] = {}
     for ex in plan:
-        for m in ex["muscles"]["primary"]:
-            if canon(m) in targets: scores[m] = scores.get(m, 0) + 3
-        for m in ex["muscles"]["secondary"]:
-            if canon(m) in targets: scores[m] = scores.get(m, 0) + 2
-        for m in ex["muscles"]["tertiary"]:
-            if canon(m) in targets: scores[m] = scores.get(m, 0) + 1
+        for tier, w in (("primary", 3), ("secondary", 2), ("tertiary", 1)):
+            for i in getattr(ex, tier):
+                if MUSCLES.keys[i] in targets:
+                    m = MUSCLES.names[i]
+                    scores[m] = scores.get(m, 0) + w
     return dict(sorted(scores.items(), key=lambda kv: (-kv[1], kv[0])))
 
 # ----------------------- Ollama call -----------------------
 
-def ollama_generate(model: str, prompt: str, host: str = "http://localhost:11434") -> str:
+def breaker_state_path(host: str) -> str:
+    """Default per-host breaker state file, shared by successive CLI runs."""
+    slug = re.sub(r"[^a-z0-9]+", "-", host.lower()).strip("-")
+    return os.path.join(tempfile.gettempdir(), f"ollama-breaker-{slug}.json")
+
+class OllamaClient:
     """
-    Calls Ollama /api/generate with stream=false to get a single JSON response.
-    Returns the 'response' text (model output).
+    One long-lived HTTP session for Ollama: connections are pooled and kept
+    alive between calls instead of a fresh TCP connect per request.
+
+      client = OllamaClient("http://localhost:11434", breaker=CircuitBreaker(...))
+      text = client.generate("llama3.1:8b", prompt)
     """
-    url = f"{host}/api/generate"
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-        "options": {"temperature": 0.4}
-    }
-    r = requests.post(url, json=payload, timeout=120)
-    r.raise_for_status()
-    data = r.json()
-    return data.get("response", "")
+
+    def __init__(self, host: str = "http://localhost:11434", timeout: float = 120, pool_size: int = 4,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.host = host.rstrip("/")
+        self.timeout = timeout
+        self.breaker = breaker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def healthy(self, timeout: float = 1.0) -> bool:
+        """Cheap liveness check (GET /api/tags); the breaker's half-open probe."""
+        r = self.session.get(f"{self.host}/api/tags", timeout=timeout)
+        return r.ok
+
+    def generate(self, model: str, prompt: str, temperature: float = 0.4) -> str:
+        """
+        Calls Ollama /api/generate with stream=false to get a single JSON response.
+        Returns the 'response' text (model output). With a breaker, raises
+        CircuitOpenError at once while the circuit is open.
+        """
+        if self.breaker is not None:
+            return self.breaker.call(lambda: self._generate(model, prompt, temperature))
+        return self._generate(model, prompt, temperature)
+
+    def _generate(self, model: str, prompt: str, temperature: float) -> str:
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "options": {"temperature": temperature}
+        }
+        r = self.session.post(f"{self.host}/api/generate", json=payload, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json().get("response", "")
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "OllamaClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class BackgroundCall(Generic[T]):
+    """
+    fn() started on a daemon thread right away; result(timeout) waits at most
+    `timeout` seconds for it, else raises TimeoutError. An abandoned call can't
+    keep the CLI from exiting.
+    """
+
+    def __init__(self, fn: Callable[[], T]):
+        self.started = time.monotonic()
+        self._box: Dict[str, Any] = {}
+        self._thread = threading.Thread(target=self._run, args=(fn,), name="llm-call", daemon=True)
+        self._thread.start()
+
+    def _run(self, fn: Callable[[], T]) -> None:
+        try:
+            self._box["value"] = fn()
+        except Exception as e:
+            self._box["error"] = e
+
+    def result(self, timeout: float) -> T:
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise TimeoutError(f"model missed the {time.monotonic() - self.started:.1f}s budget")
+        if "error" in self._box:
+            raise self._box["error"]
+        return self._box["value"]
 
 def extract_json(text: str) -> dict:
     """Attempt to parse a JSON object from model text; tolerant to extra text."""
@@ -134,19 +169,19 @@ def extract_json(text: str) -> dict:
 
 # ----------------------- AI selection -----------------------
 
-def llm_select_and_order(pool: List[Dict], targets: List[str], goal: str,
-                         session_minutes: int, n: int, model: str) -> Tuple[List[Dict], Dict[str, str]]:
+def llm_select_and_order(client: OllamaClient, pool: List[ExerciseRecord], targets: List[str], goal: str,
+                         session_minutes: int, n: int, model: str) -> Tuple[List[ExerciseRecord], Dict[str, str]]:
     """
     Ask the local model to choose + order a plan from 'pool'.
     Returns (chosen_exercises, reps_override).
     """
     catalog = [{
-        "name": ex["name"],
-        "difficulty": int(ex.get("difficulty", 0)),
-        "primary": ex["muscles"]["primary"],
-        "secondary": ex["muscles"]["secondary"],
-        "tertiary": ex["muscles"]["tertiary"],
-        "requiredSkills": ex.get("requiredSkills", [])
+        "name": ex.name,
+        "difficulty": ex.difficulty,
+        "primary": ex.muscle_names("primary"),
+        "secondary": ex.muscle_names("secondary"),
+        "tertiary": ex.muscle_names("tertiary"),
+        "requiredSkills": list(ex.skills)
     } for ex in pool]
 
     user_msg = {
@@ -173,13 +208,14 @@ def llm_select_and_order(pool: List[Dict], targets: List[str], goal: str,
         f"{json.dumps(user_msg)}"
     )
 
-    out = ollama_generate(model=model, prompt=prompt)
+    out = client.generate(model=model, prompt=prompt)
     data = extract_json(out)
     plan = data.get("plan", [])
 
     # Build fast lookup for matching by normalized name
-    by_name = {normalize_name(ex["name"]): ex for ex in pool}
-    chosen: List[Dict] = []
+    by_name = {normalize_name(ex.name): ex for ex in pool}
+    chosen: List[ExerciseRecord] = []
+    seen: Set[int] = set()
     reps_map: Dict[str, str] = {}
 
     for item in plan:
@@ -192,11 +228,12 @@ def llm_select_and_order(pool: List[Dict], targets: List[str], goal: str,
             # try a loose contains match
             matches = [v for k, v in by_name.items() if nx in k or k in nx]
             ex = matches[0] if matches else None
-        if ex and ex not in chosen:
+        if ex and ex.id not in seen:
+            seen.add(ex.id)
             chosen.append(ex)
             presc = item.get("prescription")
             if presc:
-                reps_map[ex["name"]] = presc
+                reps_map[ex.name] = presc
 
     return chosen[:n], reps_map
 
@@ -215,6 +252,12 @@ def format_plan(result: dict, fmt: str) -> str:
             diff = ex.get("difficulty", "")
             # one line per exercise; tweak to taste
             lines.append(f"{i}. {name}  {f'— {reps}' if reps else ''}  (difficulty {diff})")
+        if result.get("source"):
+            why = f" ({result['fallback_reason']})" if result.get("fallback_reason") else ""
+            lines.append(f"\nPlanned by: {result['source']}{why}")
+        circuit = result.get("llm_circuit") or {}
+        if circuit.get("state", "closed") != "closed":
+            lines.append(f"LLM circuit: {circuit['state']} (retry in {circuit.get('retry_in_s', 0)}s)")
         # optional: show focus scores
         fs = result.get("focus_scores", {})
         if fs:
@@ -234,8 +277,8 @@ def format_plan(result: dict, fmt: str) -> str:
 
 def main():
     ap = argparse.ArgumentParser(description="Local (Ollama) AI workout planner")
-    ap.add_argument("--exercises", required=True, help="Path to exercises.json")
-    ap.add_argument("--targets", required=True,
+    ap.add_argument("--exercises", help="Path to exercises.json (required unless --breaker-status)")
+    ap.add_argument("--targets",
                     help="Comma-separated list of target muscles (e.g. 'Anterior Deltoid,Pectoralis Major')")
     ap.add_argument("--user-skills", default="", help="Comma-separated unlocked skills (optional)")
     ap.add_argument("--gate-by-skills", action="store_true", help="Exclude exercises that require locked skills")
@@ -245,6 +288,18 @@ def main():
     ap.add_argument("--minutes", type=int, default=45)
     ap.add_argument("--model", default=os.getenv("OLLAMA_MODEL", "llama3.1:8b"))
     ap.add_argument("--ollama-host", default=os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+    ap.add_argument("--llm-budget", type=float, default=float(os.getenv("LLM_BUDGET_SECONDS", "1.5")),
+                    help="Seconds to wait for the model before using the heuristic plan")
+    ap.add_argument("--breaker-state", default=os.getenv("OLLAMA_BREAKER_STATE"),
+                    help="Circuit breaker state file (default: per-host file in the temp dir)")
+    ap.add_argument("--breaker-cooldown", type=float, default=30.0,
+                    help="Seconds the circuit stays open before probing /api/tags again")
+    ap.add_argument("--breaker-slow-seconds", type=float,
+                    default=float(os.environ["OLLAMA_SLOW_SECONDS"]) if os.getenv("OLLAMA_SLOW_SECONDS") else None,
+                    help="Count model calls running this long as failures (overload); "
+                         "off by default and independent of --llm-budget")
+    ap.add_argument("--breaker-status", action="store_true",
+                    help="Print the Ollama circuit breaker state as JSON and exit")
     ap.add_argument(
         "--format",
         choices=["json", "text", "markdown"],
@@ -254,8 +309,19 @@ def main():
 
     args = ap.parse_args()
 
+    client = OllamaClient(args.ollama_host)
+    # only transport / HTTP errors (and, if asked, overload) count against Ollama
+    client.breaker = CircuitBreaker(probe=client.healthy, cooldown=args.breaker_cooldown,
+                                    path=args.breaker_state or breaker_state_path(args.ollama_host),
+                                    failures=(requests.RequestException,), slow_call=args.breaker_slow_seconds)
+    if args.breaker_status:
+        print(json.dumps({"host": client.host, **client.breaker.snapshot()}, indent=2))
+        sys.exit(0)
+    if not args.exercises or not args.targets:
+        ap.error("--exercises and --targets are required")
+
     try:
-        exercises = load_exercises(args.exercises)
+        catalog = load_catalog(args.exercises)
     except Exception as e:
         print(f"Failed to load exercises: {e}", file=sys.stderr)
         sys.exit(1)
@@ -269,7 +335,7 @@ def main():
     user_skills = {canon(s) for s in [u.strip() for u in args.user_skills.split(",") if u.strip()]}
 
     pool = shortlist(
-        exercises, target_set,
+        catalog, target_set,
         min_diff=args.min_diff, max_diff=args.max_diff,
         gate_by_skills=args.gate_by_skills, user_skills=user_skills,
         top_k=40
@@ -278,47 +344,52 @@ def main():
         print(json.dumps({"error": "No exercises pass filters/targets."}, indent=2))
         sys.exit(0)
 
-    # Try AI selection first
+    # Hedged (see diversity.diversify): the model call runs on a daemon thread, which a
+    # missed --llm-budget simply abandons; with the circuit open it fails at once.
+    call = BackgroundCall(lambda: llm_select_and_order(client, pool, targets, goal="Fun, varied session",
+                                                       session_minutes=args.minutes, n=args.n, model=args.model))
+    fallback = diversify(catalog, pool, k=args.n, targets=target_set)
+
     chosen, reps_override = [], {}
+    fallback_reason = None
     try:
-        # temporarily override Ollama host for this call
-        global ollama_generate
-        def ollama_generate(model: str, prompt: str, host: str = args.ollama_host) -> str:
-            url = f"{host}/api/generate"
-            payload = {"model": model, "prompt": prompt, "stream": False, "options": {"temperature": 0.4}}
-            r = requests.post(url, json=payload, timeout=120)
-            r.raise_for_status()
-            return r.json().get("response", "")
-        chosen, reps_override = llm_select_and_order(pool, targets, goal="Fun, varied session",
-                                                        session_minutes=args.minutes, n=args.n, model=args.model)
-
+        chosen, reps_override = call.result(timeout=max(0.0, args.llm_budget - (time.monotonic() - call.started)))
+        client.close()
+        if not chosen:
+            fallback_reason = "model picked nothing usable"
+    except TimeoutError as e:
+        # missing our budget isn't a backend failure; it's only counted if the call
+        # has also run past --breaker-slow-seconds
+        client.breaker.record_abandoned(time.monotonic() - call.started)
+        fallback_reason = str(e)
+    except CircuitOpenError as e:
+        fallback_reason = str(e)
     except Exception as e:
-        # swallow and fallback
-        print(f"(AI selection failed, falling back: {e})", file=sys.stderr)
+        fallback_reason = f"AI selection failed: {e}"
 
     if chosen:
         print("(AI selection used)", file=sys.stderr)
     else:
-        print("(AI timeout/fail → heuristic fallback)", file=sys.stderr)
-
-    if not chosen:
-        # heuristic diversify as fallback
-        chosen = diversify(pool, k=args.n)
+        print(f"(heuristic plan: {fallback_reason})", file=sys.stderr)
+        chosen, reps_override = fallback, {}
 
     # Build final plan items (apply AI reps if provided, else catalog reps)
     plan_items = []
     for ex in chosen[: args.n]:
         plan_items.append({
-            "name": ex["name"],
-            "description": ex.get("description", ""),
-            "difficulty": int(ex.get("difficulty", 0)),
-            "reps": reps_override.get(ex["name"], ex.get("reps"))
+            "name": ex.name,
+            "description": ex.description,
+            "difficulty": ex.difficulty,
+            "reps": reps_override.get(ex.name, ex.reps)
         })
 
     result = {
         "plan": plan_items,
         "focus_scores": make_focus_scores(chosen, target_set),
-        "notes": ["Warm up 5–10 min", "Rest 60–90 s between sets", "Cool down & stretch"]
+        "notes": ["Warm up 5–10 min", "Rest 60–90 s between sets", "Cool down & stretch"],
+        "source": "heuristic" if fallback_reason else "llm",
+        "fallback_reason": fallback_reason,
+        "llm_circuit": client.breaker.snapshot(),
     }
     print(format_plan(result, args.format))
 
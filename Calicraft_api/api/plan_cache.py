@@ -0,0 +1,113 @@
+# plan_cache.py
+"""
+In-process LRU + TTL cache for seeded /plan responses.
+
+Only requests that carry a seed are cacheable: without one the planner is
+random on purpose. Keys are a canonical fingerprint of the request (targets and
+skills normalized and sorted) plus the catalog content hash, so editing
+exercises.json can never serve a stale plan.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def fingerprint(fields: Dict[str, Any]) -> str:
+    """Stable digest of a request dict; equal requests -> equal strings."""
+    blob = json.dumps(fields, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """
+    Thread-safe LRU with a per-entry TTL and a hard cap on entries.
+
+      cache.get(key, catalog_hash)        -> value or None (counts a hit/miss)
+      cache.put(key, catalog_hash, value)
+      cache.set_catalog(catalog_hash)     -> drop everything if the catalog changed
+      cache.stats()                       -> counters for /plan/cache
+
+    The first hash seen becomes the current one; after that only set_catalog()
+    moves it (api.py calls it when a reloaded catalog is swapped in). get/put
+    with any other hash come from a request still running on the previous
+    snapshot: they miss / are dropped instead of flushing the new entries.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl_seconds
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._catalog_hash: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _is_current(self, catalog_hash: str) -> bool:
+        # caller holds the lock
+        if self._catalog_hash is None:
+            self._catalog_hash = catalog_hash
+        return catalog_hash == self._catalog_hash
+
+    def set_catalog(self, catalog_hash: str) -> None:
+        with self._lock:
+            if catalog_hash != self._catalog_hash:
+                # a new catalog makes every entry meaningless
+                if self._data:
+                    self.invalidations += 1
+                self._data.clear()
+                self._catalog_hash = catalog_hash
+
+    def get(self, key: str, catalog_hash: str) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key) if self._is_current(catalog_hash) else None
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, catalog_hash: str, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if not self._is_current(catalog_hash):
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "catalog_hash": self._catalog_hash,
+            }
@@ -0,0 +1,148 @@
+# records.py
+"""
+Compact exercise records plus the one JSON loader every planner uses.
+
+The JSON dicts spell every field out as nested strings (ex["muscles"]["primary"],
+int(ex.get("difficulty", 5)) on every read). ExerciseRecord keeps the same data
+in __slots__ attributes instead:
+
+  rec.id                               catalog position (-1 if built standalone)
+  rec.difficulty                       int
+  rec.primary / secondary / tertiary   tuples of muscle ids (see MUSCLES)
+  rec.skills / rec.equipment           tuples of str
+  rec.tiers / rec.features             deterministic.RepsTiers / Features, precompiled
+
+Muscle ids come from MUSCLES, a process-wide append-only intern table, so an id
+means the same muscle in every catalog loaded by this process.
+"""
+import json
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from deterministic import Features, RepsTiers, compile_reps, extract_features, norm
+
+
+# -------------------- muscle ids --------------------
+
+class MuscleTable:
+    """normalized muscle name <-> small int id. Append-only: an id never changes meaning."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.keys: List[str] = []    # id -> normalized name
+        self.names: List[str] = []   # id -> spelling as first seen
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def intern(self, name: str) -> int:
+        k = norm(name)
+        i = self.ids.get(k)
+        if i is None:
+            with self._lock:
+                i = self.ids.get(k)
+                if i is None:
+                    i = len(self.keys)
+                    self.keys.append(sys.intern(k))
+                    self.names.append(name)
+                    self.ids[self.keys[i]] = i
+        return i
+
+    def get(self, name: str) -> Optional[int]:
+        """Id of `name` if any catalog has mentioned it (no new id is assigned)."""
+        return self.ids.get(norm(name))
+
+    def ids_of(self, names: Iterable[str]) -> Set[int]:
+        return {i for i in (self.get(n) for n in names) if i is not None}
+
+MUSCLES = MuscleTable()
+
+
+# -------------------- records --------------------
+
+TIER_NAMES = ("primary", "secondary", "tertiary")
+
+class ExerciseRecord:
+    __slots__ = (
+        "id", "name", "description", "difficulty", "reps",
+        "primary", "secondary", "tertiary", "skills", "equipment",
+        "tiers", "features",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        description: str,
+        difficulty: int,
+        reps: Optional[str],
+        primary: Tuple[int, ...],
+        secondary: Tuple[int, ...],
+        tertiary: Tuple[int, ...],
+        skills: Tuple[str, ...],
+        equipment: Tuple[str, ...],
+        tiers: RepsTiers,
+        features: Features,
+    ):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.difficulty = difficulty
+        self.reps = reps
+        self.primary = primary
+        self.secondary = secondary
+        self.tertiary = tertiary
+        self.skills = skills
+        self.equipment = equipment
+        self.tiers = tiers
+        self.features = features
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], id: int = -1, tiers: Optional[RepsTiers] = None) -> "ExerciseRecord":
+        m = d.get("muscles") or {}
+        return cls(
+            id=id,
+            name=sys.intern(d.get("name", "")),
+            description=d.get("description") or "",
+            difficulty=int(d.get("difficulty", 5)),
+            reps=d.get("reps") if isinstance(d.get("reps"), str) else None,
+            primary=tuple(MUSCLES.intern(x) for x in m.get("primary", [])),
+            secondary=tuple(MUSCLES.intern(x) for x in m.get("secondary", [])),
+            tertiary=tuple(MUSCLES.intern(x) for x in m.get("tertiary", [])),
+            skills=tuple(d.get("requiredSkills", [])),
+            equipment=tuple(d.get("equipment", [])),
+            tiers=tiers if tiers is not None else compile_reps(d.get("reps", ""))[0],
+            features=extract_features(d),
+        )
+
+    def muscle_names(self, tier: str) -> List[str]:
+        """Display spellings for one tier ("primary" / "secondary" / "tertiary")."""
+        return [MUSCLES.names[i] for i in getattr(self, tier)]
+
+    def __repr__(self) -> str:
+        return f"ExerciseRecord(id={self.id}, name={self.name!r}, difficulty={self.difficulty})"
+
+
+# -------------------- loading --------------------
+
+def load_exercises(path: str) -> List[Dict[str, Any]]:
+    """Read exercises.json, filling the optional fields every planner expects."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a JSON list of exercises")
+    # minimal validation
+    for ex in data:
+        if not ex.get("name"):
+            raise ValueError(f"{path}: exercise without a name: {ex!r}")
+        ex.setdefault("reps", None)
+        ex.setdefault("requiredSkills", [])
+        m = ex.setdefault("muscles", {})
+        for tier in TIER_NAMES:
+            m.setdefault(tier, [])
+    return data
+
+def load_records(path: str) -> List[ExerciseRecord]:
+    return [ExerciseRecord.from_dict(d, id=i) for i, d in enumerate(load_exercises(path))]
@@ -0,0 +1,61 @@
+# sampling.py
+"""
+Score-weighted sampling without replacement (Gumbel-top-k).
+
+Adding independent Gumbel(0, 1) noise to score / temperature and keeping the k
+largest keys draws k distinct items exactly as if you drew one at a time with
+P(item) ∝ exp(score / temperature) and removed it from the pool. That is one
+pass over the pool plus a k-sized heap: no sort, no weight table to rebuild
+after each draw (which is what an alias table would need here).
+
+  temperature -> 0    always the k best (ties: earliest first)
+  temperature ~ 1     strong preference for the best, some exploration
+  temperature large   close to uniform over the pool
+
+Every draw comes from the `rng` passed in (one rng.random() per item, in pool
+order), so the same seed and pool give the same picks.
+"""
+import heapq
+import math
+import random
+from typing import List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+def gumbel_keys(scores: Sequence[float], temperature: float, rng: random.Random) -> List[float]:
+    keys = []
+    for s in scores:
+        u = rng.random()
+        # rng.random() is in [0, 1); 0 would be log(0)
+        keys.append(s / temperature - math.log(-math.log(u or 5e-324)))
+    return keys
+
+def gumbel_top_k(
+    scored: Sequence[Tuple[T, float]],
+    k: int,
+    temperature: float,
+    rng: random.Random | None = None,
+) -> List[T]:
+    """
+    k distinct items of `scored` ((item, score) pairs, any order), sampled with
+    P ∝ exp(score / temperature), in draw order. temperature <= 0 -> the k best.
+    """
+    rng = rng or random
+    k = min(k, len(scored))
+    if k <= 0:
+        return []
+    if temperature <= 0:
+        keys = [s for _, s in scored]
+    else:
+        keys = gumbel_keys([s for _, s in scored], temperature, rng)
+    # nlargest is stable, so equal keys keep pool order
+    return [scored[j][0] for j in heapq.nlargest(k, range(len(scored)), key=keys.__getitem__)]
+
+def weighted_choice(
+    scored: Sequence[Tuple[T, float]],
+    temperature: float,
+    rng: random.Random | None = None,
+) -> T | None:
+    """One item with P ∝ exp(score / temperature) (gumbel_top_k with k=1)."""
+    picked = gumbel_top_k(scored, 1, temperature, rng)
+    return picked[0] if picked else None
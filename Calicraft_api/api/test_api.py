@@ -0,0 +1,88 @@
+# test_api.py  (python -m pytest test_api.py)
+"""Seeded /plan requests are reproducible: same JSON on repeat, through /plan/batch and with either scorer."""
+import importlib
+import json
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BUNDLED = os.path.join(HERE, "..", "..", "Swift App", "New Project", "Data", "exercises.json")
+
+REQUESTS = [
+    {"target_muscles": ["Pectoralis Major", "Triceps Brachii"], "number_of_exercises": 5,
+     "min_difficulty": 1, "max_difficulty": 10, "user_skills": [], "gate_by_skills": False, "seed": 42},
+    {"target_muscles": ["Latissimus Dorsi", "Biceps Brachii"], "number_of_exercises": 4,
+     "min_difficulty": 3, "max_difficulty": 8, "user_skills": ["Pull Up", "Push Up"], "gate_by_skills": True,
+     "seed": 7},
+    {"target_muscles": ["Rectus Abdominis", "Obliques"], "number_of_exercises": 6,
+     "min_difficulty": 1, "max_difficulty": 6, "user_skills": [], "gate_by_skills": False, "seed": 3,
+     "temperature": 0.5},
+]
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    """api.py serving a temp copy of the bundled exercises.json, hot reload off."""
+    d = tmp_path_factory.mktemp("api")
+    shutil.copy(BUNDLED, d / "exercises.json")
+    env = {
+        "EXERCISES_PATH": str(d / "exercises.json"),
+        "CATALOG_ARTIFACT_DIR": str(tmp_path_factory.mktemp("artifacts")),
+        "CATALOG_RELOAD_SECONDS": "0",
+    }
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        import api as module
+        yield importlib.reload(module)
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+@pytest.mark.parametrize("scorer", ["python", "numpy"])
+def test_seeded_plan_is_reproducible(api, monkeypatch, scorer):
+    if scorer == "numpy" and not api._numpy_available:
+        pytest.skip("numpy not installed")
+    monkeypatch.setattr(api, "SCORER", scorer)
+    client = TestClient(api.app)
+
+    def fresh(path, body):
+        api.PLAN_CACHE.clear()   # a cache hit would trivially repeat the first answer
+        r = client.post(path, json=body)
+        r.raise_for_status()
+        return r.content
+
+    first = [fresh("/plan", body) for body in REQUESTS]
+    assert all(b'"plan":[{' in c for c in first)
+    assert [fresh("/plan", body) for body in REQUESTS] == first
+    assert json.loads(fresh("/plan/batch", REQUESTS)) == [json.loads(c) for c in first]
+    assert [fresh("/plan/batch", [body]) for body in REQUESTS] == [b"[" + c + b"]" for c in first]
+
+
+def test_scorers_agree(api, monkeypatch):
+    if not api._numpy_available:
+        pytest.skip("numpy not installed")
+    client = TestClient(api.app)
+    plans = {}
+    for scorer in ("python", "numpy"):
+        monkeypatch.setattr(api, "SCORER", scorer)
+        api.PLAN_CACHE.clear()
+        plans[scorer] = [client.post("/plan", json=body).content for body in REQUESTS]
+    assert plans["python"] == plans["numpy"]
+
+
+def test_artifacts_stay_out_of_the_data_dir(api):
+    # the Data folder is bundled into the iOS app, so the server must not write there
+    data_dir = os.path.dirname(api.EX_PATH)
+    assert os.listdir(data_dir) == ["exercises.json"]
+    assert [f for f in os.listdir(api.ARTIFACT_DIR) if f.endswith(".catalog")]
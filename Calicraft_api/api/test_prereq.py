@@ -0,0 +1,22 @@
+# test_prereq.py  (python -m pytest test_prereq.py)
+from catalog import PrereqEngine
+
+
+def test_implied_chain():
+    eng = PrereqEngine(["Planche", "Tuck Planche", "Lean"], [["Tuck Planche"], ["Lean"], []])
+    assert eng.implied["planche"] == eng.mask(["Planche", "Tuck Planche", "Lean"])
+    assert eng.implied["lean"] == eng.bit["lean"]
+
+
+def test_three_cycle_shares_closure():
+    # a -> b -> c -> a, plus a tail c -> d; every visit order must give the same answer
+    names = ["A", "B", "C", "D"]
+    reqs = [["B"], ["C"], ["A", "D"], []]
+    for order in ([0, 1, 2, 3], [1, 2, 0, 3], [2, 0, 1, 3], [3, 2, 1, 0]):
+        eng = PrereqEngine([names[i] for i in order], [reqs[i] for i in order])
+        everything = eng.mask(names)
+        for s in ("a", "b", "c"):
+            assert eng.implied[s] == everything, (order, s)
+        assert eng.implied["d"] == eng.bit["d"]
+        unlocked = eng.unlocked_mask(["B"])
+        assert unlocked == everything
@@ -0,0 +1,198 @@
+# test_scoring.py  (python -m pytest test_scoring.py)
+"""
+The fast paths against the slow ones they replaced: the NumPy scorers against
+rank_candidates, top_k / LazyRanking against a full sort, and PoolIndex against
+a brute-force filter, over the bundled exercises.json and a larger synthetic
+catalog (JSON and compiled).
+"""
+import json
+import os
+import random
+
+import pytest
+
+from catalog import ExerciseCatalog, bits_to_ids, canonical_skill
+from catalog_bin import compile_catalog, read_compiled
+from deterministic import LazyRanking, norm, rank_candidates, top_k
+
+try:
+    from vectorized import MappedVectorScorer, VectorScorer
+    _numpy_available = True
+except Exception:
+    _numpy_available = False
+needs_numpy = pytest.mark.skipif(not _numpy_available, reason="numpy not installed")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BUNDLED = os.path.join(HERE, "..", "..", "Swift App", "New Project", "Data", "exercises.json")
+BANDS = ("beginner", "intermediate", "advanced", "elite")
+
+
+def synthetic(n: int, seed: int = 7):
+    """n exercises with random muscles, equipment and prerequisites (some of them cyclic)."""
+    rng = random.Random(seed)
+    muscles = [f"Muscle {j}" for j in range(30)]
+    names = [f"Move {i}" for i in range(n)]
+    out = []
+    for i, name in enumerate(names):
+        out.append({
+            "name": name,
+            "description": "",
+            "difficulty": rng.randint(1, 10),
+            "muscles": {t: rng.sample(muscles, rng.randint(0, 3)) for t in ("primary", "secondary", "tertiary")},
+            "equipment": rng.sample(["floor", "bar", "rings", "box"], rng.randint(0, 2)),
+            "reps": "6 / 8 / 10",
+            "requiredSkills": rng.sample(names, rng.choice((0, 0, 1, 2, 3))),
+        })
+    return out
+
+
+@pytest.fixture(scope="module", params=["bundled", "synthetic"])
+def source(request, tmp_path_factory):
+    """(json path, exercises) for each catalog under test; compiled artifacts go to a temp dir."""
+    d = tmp_path_factory.mktemp(request.param)
+    path = str(d / "exercises.json")
+    if request.param == "bundled":
+        with open(BUNDLED, encoding="utf-8") as f:
+            exercises = json.load(f)
+    else:
+        exercises = synthetic(600)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(exercises, f)
+    return path, exercises
+
+
+@pytest.fixture(scope="module")
+def catalogs(source):
+    """The same data as a JSON catalog, an eagerly read artifact and a lazily mapped one."""
+    path, _ = source
+    artifact = path + ".catalog"
+    compile_catalog(path, artifact)
+    return {
+        "json": ExerciseCatalog.load(path),
+        "compiled": read_compiled(artifact),
+        "mapped": read_compiled(artifact, lazy=True),
+    }
+
+
+def queries(catalog, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    muscles = sorted({m for ms in catalog.muscles for m in ms})
+    skills = sorted(catalog.skills.bit)
+    for _ in range(count):
+        lo = rng.randint(1, 10)
+        hi = rng.randint(lo, 10)
+        targets = set(rng.sample(muscles, rng.randint(0, 3)))
+        if rng.random() < 0.1:
+            targets.add("not a muscle")
+        user = rng.sample(skills, rng.choice((0, 1, 3, len(skills) // 4, len(skills) // 2, len(skills))))
+        yield lo, hi, targets, user, rng.random() < 0.7
+
+
+def named(ranked):
+    return [(e["name"], s) for e, s in ranked]
+
+
+# -------------------- numpy scorers vs rank_candidates --------------------
+
+@needs_numpy
+@pytest.mark.parametrize("kind", ["json", "mapped"])
+def test_vector_scorer_matches_rank_candidates(catalogs, kind):
+    catalog = catalogs[kind]
+    scorer = VectorScorer.from_catalog(catalog)
+    assert isinstance(scorer, MappedVectorScorer) == (kind == "mapped")
+    exercises = list(catalog.exercises)
+    muscles = sorted(scorer.muscle_index)
+    rng = random.Random(1)
+    for q in range(40):
+        focus = rng.sample(muscles, min(len(muscles), rng.randint(1, 4)))
+        band = rng.choice(BANDS)
+        flags = {"rings": False} if q % 3 == 0 else {}
+        rand = 0.0 if q % 4 == 0 else 0.2
+        ids = catalog.filter(1, 10, {norm(m) for m in focus}) if q % 2 else list(range(len(exercises)))
+        pool = [exercises[i] for i in ids]
+        n = rng.randint(1, 6)
+        base = scorer.base_scores_batch([{norm(m) for m in focus}], [band])[0]
+        for k in (None, 2 * n):
+            seed = 1000 + q
+            want = rank_candidates(pool, focus, band, flags, rand=rand, rng=random.Random(seed), k=k)
+            got = scorer.rank_from(base, flags, rand=rand, ids=ids, rng=random.Random(seed), k=k)
+            # bit-identical scores, same order (ties included)
+            assert named(got) == named(want), (q, k)
+            got = scorer.rank(focus, band, flags, rand=rand, ids=ids, rng=random.Random(seed), k=k)
+            assert named(got) == named(want), (q, k)
+
+
+@needs_numpy
+def test_batch_rows_match_single_requests(catalogs):
+    scorer = VectorScorer.from_catalog(catalogs["json"])
+    muscles = sorted(scorer.muscle_index)
+    rng = random.Random(2)
+    focuses = [set(rng.sample(muscles, 2)) for _ in range(12)]
+    bands = [rng.choice(BANDS) for _ in focuses]
+    batch = scorer.base_scores_batch(focuses, bands)
+    for row, (focus, band) in enumerate(zip(focuses, bands)):
+        assert batch[row].tolist() == scorer.base_scores(focus, band).tolist()
+
+
+# -------------------- top_k / LazyRanking vs a full sort --------------------
+
+def test_top_k_and_lazy_ranking_match_full_sort():
+    rng = random.Random(3)
+    for trial in range(200):
+        # coarse scores, so ties are common and their order matters
+        scored = [({"i": i}, rng.randint(0, 12) / 4) for i in range(rng.randint(0, 60))]
+        full = sorted(scored, key=lambda x: x[1], reverse=True)
+        for k in (0, 1, 5, len(scored), len(scored) + 3):
+            assert top_k(scored, k) == full[:k]
+        lazy = LazyRanking(scored)
+        assert len(lazy) == len(full)
+        if full:
+            j = rng.randrange(len(full))
+            assert lazy[j] == full[j]
+            assert lazy[-1] == full[-1]
+        assert lazy[:4] == full[:4]
+        assert list(lazy) == full
+        assert list(lazy) == full   # iterating again reuses what was already sorted
+
+
+def test_rank_candidates_k_and_lazy_match_full(catalogs):
+    exercises = list(catalogs["json"].exercises)
+    for seed in range(10):
+        full = rank_candidates(exercises, ["Latissimus Dorsi", "Biceps Brachii"], "intermediate", {},
+                               rand=0.2, rng=random.Random(seed))
+        for k in (1, 12):
+            got = rank_candidates(exercises, ["Latissimus Dorsi", "Biceps Brachii"], "intermediate", {},
+                                  rand=0.2, rng=random.Random(seed), k=k)
+            assert named(got) == named(full[:k])
+        lazy = rank_candidates(exercises, ["Latissimus Dorsi", "Biceps Brachii"], "intermediate", {},
+                               rand=0.2, rng=random.Random(seed), lazy=True)
+        assert named(lazy) == named(full)
+
+
+# -------------------- PoolIndex vs brute force --------------------
+
+def brute_filter(exercises, catalog, lo, hi, targets, unlocked):
+    out = []
+    for i, ex in enumerate(exercises):
+        if not lo <= int(ex.get("difficulty", 5)) <= hi:
+            continue
+        muscles = {norm(m) for tier in ex.get("muscles", {}).values() for m in tier}
+        if targets and not muscles & targets:
+            continue
+        if unlocked is not None:
+            req = catalog.skills.mask(canonical_skill(s) for s in ex.get("requiredSkills", []))
+            if req & ~unlocked:
+                continue
+        out.append(i)
+    return out
+
+
+@pytest.mark.parametrize("kind", ["json", "compiled", "mapped"])
+def test_pool_index_matches_brute_force(source, catalogs, kind):
+    _, exercises = source
+    catalog = catalogs[kind]
+    for lo, hi, targets, user, gate in queries(catalog, 300):
+        unlocked = catalog.skills.unlocked_mask(user) if gate else None
+        want = brute_filter(exercises, catalog, lo, hi, targets, unlocked)
+        assert catalog.filter(lo, hi, targets, unlocked) == want
+        assert bits_to_ids(catalog.pool.mask(lo, hi, targets, unlocked)) == want
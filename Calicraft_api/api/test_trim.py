@@ -0,0 +1,134 @@
+# test_trim.py  (python -m pytest test_trim.py)
+"""TimeBudget trimming against the loop it replaced, which re-summed the plan on every pass."""
+import copy
+import math
+import os
+import random
+import re
+
+import pytest
+
+import deterministic
+from catalog import ExerciseCatalog
+from deterministic import assemble_plan, rank_candidates, serialize_plan, trim_to_time_budget
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BUNDLED = os.path.join(HERE, "..", "..", "Swift App", "New Project", "Data", "exercises.json")
+
+
+# -------------------- the old loop, verbatim (string doses) --------------------
+
+def old_estimate_time_per_set(dose: str, block: str) -> int:
+    m_s = re.match(r"^\s*(\d+)\s*s\s*$", dose)
+    m_r = re.match(r"^\s*(\d+)\s*reps\s*$", dose, flags=re.I)
+    m_m = re.match(r"^\s*(\d+)(?:-(\d+))?\s*m\s*$", dose, flags=re.I)
+
+    if m_s:
+        secs = int(m_s.group(1))
+        rest = 60 if block == "strength" else 45 if block in ("skill", "accessory") else 15
+        return secs + rest
+    if m_r:
+        reps = int(m_r.group(1))
+        sec_per_rep = 3.0 if block == "strength" else 2.5
+        rest = 75 if block == "strength" else 45
+        return int(reps * sec_per_rep + rest)
+    if m_m:
+        lo = int(m_m.group(1)); hi = int(m_m.group(2) or lo)
+        return int(((lo + hi) / 2) * 60)
+    return 60
+
+def old_total_plan_seconds(plan):
+    secs = 0
+    for block in plan["blocks"]:
+        for it in block["items"]:
+            secs += old_estimate_time_per_set(it["dose"], block["name"]) * int(it["sets"])
+    return secs
+
+def old_trim_to_time_budget(plan) -> None:
+    budget = plan["minutes"] * 60
+    order = ["accessory", "strength", "skill"]
+    while old_total_plan_seconds(plan) > budget:
+        trimmed = False
+        for bname in order:
+            for block in plan["blocks"]:
+                if block["name"] != bname:
+                    continue
+                for it in reversed(block["items"]):
+                    if it["sets"] > 1:
+                        it["sets"] -= 1
+                        trimmed = True
+                        break
+                if trimmed:
+                    break
+            if trimmed:
+                break
+        if not trimmed:
+            for block in plan["blocks"]:
+                for it in block["items"]:
+                    m_s = re.match(r"^\s*(\d+)\s*s\s*$", it["dose"])
+                    m_r = re.match(r"^\s*(\d+)\s*reps\s*$", it["dose"], flags=re.I)
+                    if m_s:
+                        val = int(m_s.group(1))
+                        if val > 20:
+                            it["dose"] = f"{max(15, int(val * 0.7))}s"
+                            trimmed = True
+                            break
+                    elif m_r:
+                        val = int(m_r.group(1))
+                        if val > 6:
+                            it["dose"] = f"{max(5, int(math.ceil(val * 0.8)))} reps"
+                            trimmed = True
+                            break
+                if trimmed:
+                    break
+        if not trimmed:
+            break
+
+
+# -------------------- plans --------------------
+
+@pytest.fixture(scope="module")
+def exercises():
+    return ExerciseCatalog.load(BUNDLED).exercises
+
+
+def untrimmed_plans(exercises, count: int, seed: int = 0):
+    """assemble_plan output for random requests before trimming, with sets inflated so trimming runs deep."""
+    rng = random.Random(seed)
+    muscles = sorted({m for ex in exercises for tier in ex["muscles"].values() for m in tier})
+    plans = []
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(deterministic, "trim_to_time_budget", lambda plan: None)
+        for _ in range(count):
+            band = rng.choice(("beginner", "intermediate", "advanced", "elite"))
+            scored = rank_candidates(exercises, rng.sample(muscles, 3), band, {}, rand=0.3, rng=rng)
+            plan = assemble_plan(scored, minutes=rng.randint(3, 60), band=band, top_k=6, rand=0.3, rng=rng)
+            for block in plan["blocks"]:
+                for it in block["items"]:
+                    it["sets"] += rng.randint(0, 4)
+            plans.append(plan)
+    return plans
+
+
+def test_trim_matches_old_loop(exercises):
+    trimmed = shrunk = 0
+    for plan in untrimmed_plans(exercises, 500):
+        old = serialize_plan(plan)          # the old loop worked on string doses
+        doses = [it["dose"] for block in old["blocks"] for it in block["items"]]
+        before = copy.deepcopy(old)
+        old_trim_to_time_budget(old)
+        trim_to_time_budget(plan)
+        assert serialize_plan(plan) == old
+        trimmed += old != before
+        shrunk += doses != [it["dose"] for block in old["blocks"] for it in block["items"]]
+    # both phases ran: dropping sets, and shortening doses once no set was left to drop
+    assert trimmed > 250 and shrunk > 50, (trimmed, shrunk)
+
+
+def test_trim_accepts_string_doses(exercises):
+    for plan in untrimmed_plans(exercises, 100, seed=1):
+        old = serialize_plan(plan)
+        new = copy.deepcopy(old)
+        old_trim_to_time_budget(old)
+        trim_to_time_budget(new)
+        assert serialize_plan(new) == old
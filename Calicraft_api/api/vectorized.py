@@ -0,0 +1,222 @@
+# vectorized.py
+"""
+NumPy version of deterministic.rank_candidates.
+
+Everything score_exercise() recomputes per call (normalized muscles, movement
+class, difficulty, equipment tokens) is laid out once as arrays, and a request
+is scored with a single matrix-vector product over the whole catalog.
+Scores, jitter draws and tie order match rank_candidates exactly, so the same
+seed gives the same ranking with either scorer.
+"""
+import random
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from deterministic import difficulty_band_to_range, features, norm
+
+# score_exercise weighs primary hits 3, secondary 1 and ignores tertiary. Not
+# catalog.TIER_WEIGHTS (3/2/1), which is for focus/tier scores and diversity
+SCORE_TIER_WEIGHTS = (("primary", 3.0), ("secondary", 1.0), ("tertiary", 0.0))
+
+
+class VectorScorer:
+    """
+    Precomputed score inputs for a fixed exercise list:
+
+      W          exercises × muscles, SCORE_TIER_WEIGHTS per listing
+      difficulty float difficulty per exercise
+      bump       0.3 for skill/core movements, else 0
+      equip      exercises × equipment tokens (bool)
+    """
+
+    def __init__(self, exercises: List[Dict[str, Any]]):
+        self.exercises = exercises
+        n = len(exercises)
+        self.muscle_index: Dict[str, int] = {}
+        self.equip_index: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        vals: List[float] = []
+        erows: List[int] = []
+        ecols: List[int] = []
+        for i, ex in enumerate(exercises):
+            m = ex.get("muscles", {})
+            for tier, w in SCORE_TIER_WEIGHTS:
+                for x in m.get(tier, []):
+                    rows.append(i)
+                    cols.append(self.muscle_index.setdefault(norm(x), len(self.muscle_index)))
+                    vals.append(w)
+            for x in ex.get("equipment", []):
+                erows.append(i)
+                ecols.append(self.equip_index.setdefault(norm(x), len(self.equip_index)))
+
+        self.W = np.zeros((n, len(self.muscle_index)))
+        np.add.at(self.W, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), vals)
+        self.equip = np.zeros((n, len(self.equip_index)), dtype=bool)
+        self.equip[erows, ecols] = True
+        self.difficulty = np.array([features(ex).difficulty for ex in exercises], dtype=float)
+        self.bump = np.array(
+            [0.3 if features(ex).movement in ("skill", "core") else 0.0 for ex in exercises]
+        )
+
+    @classmethod
+    def from_catalog(cls, catalog) -> "VectorScorer":
+        """
+        Scorer over an ExerciseCatalog. One mapped from a compiled artifact is scored
+        straight from its columns (MappedVectorScorer); anything else via __init__.
+        """
+        if catalog.arrays is not None:
+            return MappedVectorScorer(catalog)
+        return cls(catalog.exercises)
+
+    @staticmethod
+    def _top_k_positions(s: np.ndarray, k: int) -> np.ndarray:
+        """
+        Positions of the k best scores in O(n) via np.partition. At the cut, the
+        earliest ties win, so this is the same set a stable full sort would keep.
+        """
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        kth = np.partition(s, len(s) - k)[len(s) - k]
+        better = np.flatnonzero(s > kth)
+        ties = np.flatnonzero(s == kth)[: k - len(better)]
+        return np.concatenate([better, ties])
+
+    def focus_vector(self, focus: Iterable[str]) -> np.ndarray:
+        f = np.zeros(len(self.muscle_index))
+        for m in focus:
+            j = self.muscle_index.get(norm(m))
+            if j is not None:
+                f[j] = 1.0
+        return f
+
+    def equipment_mask(self, equipment_flags: Dict[str, bool]) -> np.ndarray:
+        """True where every required token is allowed (unknown tokens default to allowed)."""
+        denied = [j for tok, j in self.equip_index.items() if not equipment_flags.get(tok, True)]
+        if not denied:
+            return np.ones(len(self.exercises), dtype=bool)
+        return ~self.equip[:, denied].any(axis=1)
+
+    def base_scores(self, focus: Set[str], band: str) -> np.ndarray:
+        """score_exercise() for every exercise, without jitter (equipment assumed ok)."""
+        return self.base_scores_batch([focus], [band])[0]
+
+    def base_scores_batch(self, focuses: List[Set[str]], bands: List[str]) -> np.ndarray:
+        """
+        base_scores for many requests at once: a (requests × exercises) matrix from
+        one (requests × muscles) @ (muscles × exercises) product.
+        """
+        F = np.zeros((len(focuses), len(self.muscle_index)))
+        for r, focus in enumerate(focuses):
+            F[r] = self.focus_vector(focus)
+        centers = np.array([sum(difficulty_band_to_range(b)) / 2 for b in bands]).reshape(-1, 1)
+        difficulty_match = 1 - np.abs(centers - self.difficulty) / 10
+        # same operation order as score_exercise so the floats come out bit-identical
+        return self._muscle_scores(F) + 1.5 * difficulty_match + 1.0 + self.bump
+
+    def _muscle_scores(self, F: np.ndarray) -> np.ndarray:
+        return F @ self.W.T
+
+    def rank(
+        self,
+        focus_muscles: List[str],
+        band: str,
+        equipment_flags: Dict[str, bool],
+        rand: float,
+        ids: Optional[List[int]] = None,
+        rng: Optional[random.Random] = None,
+        k: Optional[int] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Drop-in for rank_candidates over self.exercises (or just `ids`, in that order).
+        """
+        base = self.base_scores({norm(m) for m in focus_muscles}, band)
+        return self.rank_from(base, equipment_flags, rand, ids=ids, rng=rng, k=k)
+
+    def score_candidates(
+        self,
+        focus_muscles: List[str],
+        band: str,
+        equipment_flags: Dict[str, bool],
+        ids: Optional[List[int]] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Drop-in for deterministic.score_candidates (unsorted, no jitter)."""
+        base = self.base_scores({norm(m) for m in focus_muscles}, band)
+        return self.candidates_from(base, equipment_flags, ids=ids)
+
+    def candidates_from(
+        self,
+        base: np.ndarray,
+        equipment_flags: Dict[str, bool],
+        ids: Optional[List[int]] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """(exercise, score) for the equipment-allowed ids of one base_scores row, in id order."""
+        ids = np.arange(len(self.exercises)) if ids is None else np.asarray(ids, dtype=np.intp)
+        ids = ids[self.equipment_mask(equipment_flags)[ids]]
+        return [(self.exercises[i], v) for i, v in zip(ids.tolist(), base[ids].tolist())]
+
+    def rank_from(
+        self,
+        base: np.ndarray,
+        equipment_flags: Dict[str, bool],
+        rand: float,
+        ids: Optional[List[int]] = None,
+        rng: Optional[random.Random] = None,
+        k: Optional[int] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Jitter + sort one row of base_scores / base_scores_batch (only the k best if k is given)."""
+        rng = rng or random
+        ids = np.arange(len(self.exercises)) if ids is None else np.asarray(ids, dtype=np.intp)
+        ids = ids[self.equipment_mask(equipment_flags)[ids]]
+        s = base[ids]
+        if rand > 0:
+            # one draw per kept exercise, in order, exactly like random.uniform(-0.4, 0.4)
+            r = np.array([rng.random() for _ in range(len(ids))])
+            s = s + (-0.4 + (0.4 - -0.4) * r) * rand
+        if k is not None and k < len(s):
+            sel = self._top_k_positions(s, k)
+            order = sel[np.argsort(-s[sel], kind="stable")]
+        else:
+            order = np.argsort(-s, kind="stable")
+        return [(self.exercises[i], float(v)) for i, v in zip(ids[order].tolist(), s[order].tolist())]
+
+
+class MappedVectorScorer(VectorScorer):
+    """
+    VectorScorer over a compiled catalog (catalog_bin) without building W or equip:
+    the (row, muscle) and (row, equipment) pairs, difficulty and movement columns are
+    np.frombuffer views of the shared mapping, so extra workers add no per-catalog
+    arrays beyond `bump`. Muscle scores are exact small integers either way, so the
+    sparse sums match F @ W.T bit for bit.
+    """
+
+    def __init__(self, catalog):
+        a = catalog.arrays
+        strs = catalog.strings
+        col = lambda name: np.frombuffer(a[name], dtype=np.int32)
+        self.exercises = catalog.exercises
+        n = len(catalog)
+        self.muscle_index = {strs[k]: c for c, k in enumerate(col("DSPK"))}
+        self.equip_index = {strs[k]: c for c, k in enumerate(col("QK"))}
+        # (rows, cols, weight) per scored tier, in SCORE_TIER_WEIGHTS order; tertiary weighs 0
+        self._pairs = [(col(f"W{j}R"), col(f"W{j}C"), w) for j, (_, w) in enumerate(SCORE_TIER_WEIGHTS) if w]
+        self._equip_rows, self._equip_cols = col("QR"), col("QC")
+        self.difficulty = col("DIFF")
+        moves = {k for k in set(col("FMOV").tolist()) if strs[k] in ("skill", "core")}
+        self.bump = np.where(np.isin(col("FMOV"), list(moves)), 0.3, 0.0)
+        self._n = n
+
+    def _muscle_scores(self, F: np.ndarray) -> np.ndarray:
+        out = np.zeros((len(F), self._n))
+        for r, f in enumerate(F):
+            for rows, cols, w in self._pairs:
+                out[r] += w * np.bincount(rows, weights=f[cols], minlength=self._n)
+        return out
+
+    def equipment_mask(self, equipment_flags: Dict[str, bool]) -> np.ndarray:
+        denied = [j for tok, j in self.equip_index.items() if not equipment_flags.get(tok, True)]
+        ok = np.ones(self._n, dtype=bool)
+        if denied:
+            ok[self._equip_rows[np.isin(self._equip_cols, denied)]] = False
+        return ok
@@ -1,31 +1,44 @@
 # app.py
-from typing import List, Dict, Optional, Tuple, Set
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Any, List, Dict, Optional, Tuple, Set
+from fastapi import Depends, FastAPI, HTTPException, Request
 from pydantic import BaseModel, Field
-import os, json
+import os, sys, json, heapq, asyncio, time
+
+# Shared catalog/index code lives next to the planner API
+HERE = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.getenv("CALICRAFT_API_DIR", os.path.join(HERE, "..", "..", "..", "Calicraft_api", "api"))
+sys.path.insert(0, os.path.abspath(API_DIR))
+from catalog import bits_to_ids
+from catalog_bin import load_catalog
+from deterministic import Dose, band_to_index
+from diversity import diversify
+from records import MUSCLES, ExerciseRecord
 
 # Optional OpenAI (for AI selection + reps refinement)
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
     _openai_available = True
 except Exception:
     _openai_available = False
 
 MODEL_NAME = os.getenv("OPENAI_MODEL", "gpt-4o-mini")  # change if you want
+# how long /plan waits for the model before serving the heuristic plan it already built
+# (a request can pick its own with llm_deadline_seconds, up to LLM_DEADLINE_SECONDS)
+LLM_BUDGET_SECONDS = float(os.getenv("LLM_BUDGET_SECONDS", "1.5"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "20"))
 
-# ---------- Models that match YOUR JSON ----------
-class Muscles(BaseModel):
-    primary: List[str] = []
-    secondary: List[str] = []
-    tertiary: List[str] = []
-
-class Exercise(BaseModel):
-    name: str
-    description: str
-    difficulty: int
-    muscles: Muscles
-    reps: Optional[str] = None
-    requiredSkills: List[str] = []
+def make_llm_client() -> Optional[Any]:
+    """
+    One async OpenAI client for the whole process (built at startup): its HTTP pool keeps
+    connections alive across requests instead of a new TCP/TLS handshake each call.
+    None when openai isn't installed or OPENAI_API_KEY isn't set.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not _openai_available or not api_key:
+        return None
+    # the budget is enforced per request (asyncio.wait_for); no SDK retries behind its back
+    return AsyncOpenAI(api_key=api_key, timeout=LLM_DEADLINE_SECONDS, max_retries=0)
 
 # ---------- Request/Response ----------
 class PlanRequest(BaseModel):
@@ -38,6 +51,7 @@ class PlanRequest(BaseModel):
     use_llm: bool = False                  # if true: AI selection + reps
     goal: Optional[str] = None
     session_minutes: Optional[int] = 45
+    llm_deadline_seconds: Optional[float] = None  # default LLM_BUDGET_SECONDS, capped at LLM_DEADLINE_SECONDS
 
 class PlanExercise(BaseModel):
     name: str
@@ -49,89 +63,106 @@ class PlanResponse(BaseModel):
     plan: List[PlanExercise]
     focus_scores: Dict[str, int]
     notes: List[str] = []
+    source: str = "heuristic"               # "llm" | "heuristic": which plan was served
+    fallback_reason: Optional[str] = None   # why the model's plan wasn't used (use_llm only)
 
 # ---------- Load your dataset ----------
-HERE = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(HERE, "exercises.json")
-with open(DATA_PATH, "r") as f:
-    RAW = json.load(f)
-EXERCISES: List[Exercise] = [Exercise(**e) for e in RAW]
+# compact records only; read from the compiled catalog when it is up to date
+# (python compile_catalog.py exercises.json, written to the user cache dir), else parsed from the JSON
+CATALOG = load_catalog(DATA_PATH, keep_source=False)
+EXERCISES: List[ExerciseRecord] = CATALOG.records  # EXERCISES[i].id == i
 
 # ---------- Helpers ----------
 def canon(s: str) -> str:
     return s.strip().lower()
 
-def compatibility_score(ex: Exercise, targets: Set[str]) -> int:
-    s = 0
-    s += 3 * len({canon(m) for m in ex.muscles.primary}   & targets)
-    s += 2 * len({canon(m) for m in ex.muscles.secondary} & targets)
-    s += 1 * len({canon(m) for m in ex.muscles.tertiary}  & targets)
-    return s
-
-def shortlist(filtered: List[Exercise], targets: Set[str], top_k: int = 40) -> List[Exercise]:
-    scored = [(ex, compatibility_score(ex, targets)) for ex in filtered]
-    scored = [t for t in scored if t[1] > 0]
-    scored.sort(key=lambda t: (t[1], t[0].difficulty, t[0].name.lower()), reverse=True)
-    return [ex for ex, _ in scored[:top_k]]
+def shortlist(ids: List[int], targets: Set[str], top_k: int = 40) -> List[ExerciseRecord]:
+    # 3/2/1 per primary/secondary/tertiary hit, read straight off the muscle postings;
+    # `ids` already passed the filters and hit a target
+    scores = CATALOG.tier_scores(targets)
+    scored = [(EXERCISES[i], scores[i]) for i in ids if i in scores]
+    # heap selection of the top_k (same result as a stable reverse sort + slice)
+    return [ex for ex, _ in heapq.nlargest(top_k, scored, key=lambda t: (t[1], t[0].difficulty, t[0].name.lower()))]
 
-def make_focus_scores(plan: List[Exercise], targets: Set[str]) -> Dict[str,int]:
+def make_focus_scores(plan: List[ExerciseRecord], targets: Set[str]) -> Dict[str,int]:
     scores: Dict[str,int] = {}
     for ex in plan:
-        for m in ex.muscles.primary:
-            if canon(m) in targets: scores[m] = scores.get(m,0)+3
-        for m in ex.muscles.secondary:
-            if canon(m) in targets: scores[m] = scores.get(m,0)+2
-        for m in ex.muscles.tertiary:
-            if canon(m) in targets: scores[m] = scores.get(m,0)+1
+        for tier, w in (("primary", 3), ("secondary", 2), ("tertiary", 1)):
+            for i in getattr(ex, tier):
+                if MUSCLES.keys[i] in targets:
+                    m = MUSCLES.names[i]
+                    scores[m] = scores.get(m,0)+w
     return dict(sorted(scores.items(), key=lambda kv: (-kv[1], kv[0])))
 
-def diversify(candidates: List[Exercise], k: int) -> List[Exercise]:
+# -------------- LLM selection + ordering ---------------
+BLOCKS = ["warmup", "skill", "strength", "accessory", "finisher"]
+
+def plan_schema(names: List[str]) -> Dict[str, Any]:
     """
-    Heuristic fallback: limit consecutive repeats of the same first-listed muscle.
+    Structured-outputs schema for one round trip: picks, order and prescriptions.
+    `name` is an enum of the shortlist, so every item is an exact catalog name.
     """
-    chosen: List[Exercise] = []
-    last_primary: Optional[str] = None
-    for ex in candidates:
-        top = ex.muscles.primary[0].lower() if ex.muscles.primary else ex.name.lower()
-        if last_primary and top == last_primary:
-            continue
-        chosen.append(ex)
-        last_primary = top
-        if len(chosen) >= k:
-            break
-    # If we didn't fill k, append the rest
-    if len(chosen) < k:
-        for ex in candidates:
-            if ex not in chosen:
-                chosen.append(ex)
-                if len(chosen) >= k:
-                    break
-    return chosen[:k]
-
-# -------------- LLM selection + ordering ---------------
-def llm_select_and_order(pool: List[Exercise], req: PlanRequest) -> Tuple[List[Exercise], Dict[str, str]]:
+    return {
+        "name": "workout_plan",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "plan": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string", "enum": names},
+                            "prescription": {"type": "string"},
+                            "block": {"type": "string", "enum": BLOCKS},
+                        },
+                        "required": ["name", "prescription", "block"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["plan"],
+            "additionalProperties": False,
+        },
+    }
+
+def tier_prescription(ex: ExerciseRecord, sets: int = 3) -> str:
+    """Sets × the catalog's middle reps tier, e.g. '3×10 reps' / '3×30s' (no LLM needed)."""
+    values, unit = ex.tiers
+    return f"{sets}×{Dose(values[band_to_index('intermediate', len(values))], unit)}"
+
+def llm_deadline(req: PlanRequest) -> float:
+    if req.llm_deadline_seconds is None:
+        return min(LLM_BUDGET_SECONDS, LLM_DEADLINE_SECONDS)
+    return max(0.0, min(req.llm_deadline_seconds, LLM_DEADLINE_SECONDS))
+
+async def llm_select_and_order(client: Optional[Any], pool: List[ExerciseRecord], req: PlanRequest) -> Tuple[List[ExerciseRecord], Dict[str, str]]:
     """
-    Returns (chosen_exercises, reps_map). If LLM unavailable/fails, returns ([], {}).
+    Returns (chosen_exercises, reps_map) from a single structured call.
+    If LLM unavailable/fails, returns ([], {}). No deadline of its own: /plan
+    cancels it once the budget is spent.
     """
-    if not req.use_llm or not _openai_available:
+    if not req.use_llm or client is None:
         return [], {}
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return [], {}
+    # exact names only (the schema's enum); first of any duplicate name wins
+    by_name: Dict[str, ExerciseRecord] = {}
+    for ex in pool:
+        by_name.setdefault(ex.name, ex)
 
     # Build compact catalog to stay token-light
     catalog = [{
         "name": ex.name,
         "difficulty": ex.difficulty,
-        "primary": ex.muscles.primary,
-        "secondary": ex.muscles.secondary,
-        "tertiary": ex.muscles.tertiary,
-        "requiredSkills": ex.requiredSkills
-    } for ex in pool]
+        "primary": ex.muscle_names("primary"),
+        "secondary": ex.muscle_names("secondary"),
+        "tertiary": ex.muscle_names("tertiary"),
+        "requiredSkills": list(ex.skills)
+    } for ex in by_name.values()]
 
     try:
-        client = OpenAI(api_key=api_key)
         user_msg = {
             "target_muscles": req.target_muscles,
             "goal": req.goal or "balanced hypertrophy & skill practice",
@@ -147,44 +178,31 @@ def llm_select_and_order(pool: List[Exercise], req: PlanRequest) -> Tuple[List[E
                 "Mix push/pull/legs/core where possible; include some novelty and fun.",
                 "Prefer 1 skill/progression item (if allowed), 2 strength, 2 accessory/core, and an optional finisher.",
                 "Keep total volume appropriate for the session_minutes.",
-                "Return STRICT JSON: {\"plan\":[{\"name\":\"...\",\"prescription\":\"3x8-12\",\"block\":\"warmup|skill|strength|accessory|finisher\"}, ...]}"
+                "Give every item a prescription: sets×reps or time, e.g. '3×8–12' or '3×20s'.",
             ]
         }
 
-        resp = client.chat.completions.create(
+        resp = await client.chat.completions.create(
             model=MODEL_NAME,
-            response_format={"type": "json_object"},
+            response_format={"type": "json_schema", "json_schema": plan_schema(list(by_name))},
             messages=[
-                {"role": "system", "content": "You are a world-class calisthenics coach. Output strict JSON only."},
+                {"role": "system", "content": "You are a world-class calisthenics coach."},
                 {"role": "user", "content": json.dumps(user_msg)}
             ],
             temperature=0.4,
         )
-        content = resp.choices[0].message.content
-        parsed = json.loads(content)
-        plan = parsed.get("plan", [])
-
-        # Build lookup (normalized) from pool
-        def norm(s: str) -> str:
-            return s.lower().replace("–", "-").replace("’", "'").replace(" push ups", " push up").strip()
+        plan = json.loads(resp.choices[0].message.content)["plan"]
 
-        by_name = {norm(ex.name): ex for ex in pool}
         reps_map: Dict[str, str] = {}
-        chosen: List[Exercise] = []
-
+        chosen: List[ExerciseRecord] = []
+        seen: Set[int] = set()
         for item in plan:
-            nm = item.get("name")
-            if not nm: continue
-            nx = norm(nm)
-            ref = by_name.get(nx)
-            if not ref:
-                # try loose match by startswith/contains
-                matches = [ex for key, ex in by_name.items() if nx in key or key in nx]
-                ref = matches[0] if matches else None
-            if ref and ref not in chosen:
+            ref = by_name.get(item["name"])
+            if ref and ref.id not in seen:
+                seen.add(ref.id)
                 chosen.append(ref)
-                if "prescription" in item and item["prescription"]:
-                    reps_map[ref.name] = item["prescription"]
+                if item["prescription"].strip():
+                    reps_map[ref.name] = item["prescription"].strip()
 
         # truncate to requested size
         chosen = chosen[: req.number_of_exercises]
@@ -192,101 +210,86 @@ def llm_select_and_order(pool: List[Exercise], req: PlanRequest) -> Tuple[List[E
     except Exception:
         return [], {}
 
-# -------------- Optional LLM reps-only refinement ---------------
-def llm_fill_reps(plan_items: List["PlanExercise"], req: PlanRequest) -> None:
-    if not req.use_llm or not _openai_available:
-        return
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return
-    try:
-        client = OpenAI(api_key=api_key)
-        payload = {
-            "goal": req.goal or "balanced hypertrophy & skill practice",
-            "session_minutes": req.session_minutes or 45,
-            "target_muscles": req.target_muscles,
-            "exercises": [{"name": it.name, "difficulty": it.difficulty} for it in plan_items],
-            "instructions": (
-                "Assign sensible sets×reps or time (e.g., '3×8–12' or '3×20s') for each exercise "
-                "to fit the session length. Return only JSON: "
-                "{\"plan\": [{\"name\":\"...\",\"reps\":\"...\"}, ...]}"
-            ),
-        }
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": "You are a concise strength coach. Output strict JSON only."},
-                {"role": "user", "content": json.dumps(payload)},
-            ],
-            temperature=0.2,
-        )
-        content = resp.choices[0].message.content
-        parsed = json.loads(content)
-        reps_map = {p["name"]: p["reps"] for p in parsed.get("plan", []) if "name" in p and "reps" in p}
-        for it in plan_items:
-            if not it.reps and it.name in reps_map:
-                it.reps = reps_map[it.name]
-    except Exception:
-        pass
-
 # ---------- API ----------
-app = FastAPI(title="Workout AI Planner (catalog → plan)")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.llm = make_llm_client()
+    yield
+    if app.state.llm is not None:
+        await app.state.llm.close()
+
+app = FastAPI(title="Workout AI Planner (catalog → plan)", lifespan=lifespan)
+
+async def get_llm(request: Request) -> Optional[Any]:
+    return request.app.state.llm
 
+# async all the way: an LLM call in flight awaits on the event loop instead of holding a
+# threadpool worker, so heuristic-only requests never queue behind slow LLM ones
 @app.post("/plan", response_model=PlanResponse)
-def plan(req: PlanRequest):
+async def plan(req: PlanRequest, llm: Optional[Any] = Depends(get_llm)):
+    started = time.monotonic()
     if not req.target_muscles:
         raise HTTPException(status_code=400, detail="target_muscles cannot be empty")
 
     targets: Set[str] = {canon(m) for m in req.target_muscles}
-    user_skills: Set[str] = {canon(s) for s in req.user_skills}
-
-    # Filter by difficulty and skills if requested
-    filtered: List[Exercise] = []
-    for ex in EXERCISES:
-        if not (req.min_difficulty <= ex.difficulty <= req.max_difficulty):
-            continue
-        if req.gate_by_skills:
-            required = {canon(s) for s in ex.requiredSkills}
-            if not required.issubset(user_skills):
-                continue
-        filtered.append(ex)
-
-    if not filtered:
+    # user skills plus every easier progression they imply, as one bitmask
+    unlocked = CATALOG.skills.unlocked_mask(req.user_skills) if req.gate_by_skills else None
+
+    # Filter by difficulty and skills if requested (bitsets from the catalog's pool index)
+    passing = CATALOG.pool.mask(req.min_difficulty, req.max_difficulty, None, unlocked)
+    if not passing:
         raise HTTPException(status_code=404, detail="No exercises pass filters.")
+    filtered = bits_to_ids(passing & CATALOG.pool.target_mask(targets))
 
-    # --- Strategy A: AI chooses and orders from a shortlist ---
-    chosen: List[Exercise] = []
-    reps_override: Dict[str, str] = {}
-    if req.use_llm:
-        pool = shortlist(filtered, targets, top_k=40)
-        chosen, reps_override = llm_select_and_order(pool, req)
+    pool = shortlist(filtered, targets, top_k=40)
 
-    # --- Strategy B: Heuristic fallback if AI off or failed ---
-    if not chosen:
-        # deterministic shortlist then diversify
-        pool = shortlist(filtered, targets, top_k=40)
-        chosen = diversify(pool, k=req.number_of_exercises)
+    # Hedged (see diversity.diversify): the model call is a task on this event loop, and
+    # wait_for below cancels it once llm_deadline(req) has passed
+    llm_call = None
+    if req.use_llm and llm is not None and pool:
+        llm_call = asyncio.create_task(llm_select_and_order(llm, pool, req))
+        await asyncio.sleep(0)   # let it send the request before the heuristic work
 
-    # Build response items (apply AI reps where available; else keep dataset default)
+    # --- Strategy B: heuristic (deterministic shortlist then diversify) ---
+    chosen = diversify(CATALOG, pool, k=req.number_of_exercises, targets=targets)
+    reps_override: Dict[str, str] = {}
+    source, fallback_reason = "heuristic", None
+
+    # --- Strategy A: AI chooses and orders from the same shortlist ---
+    if llm_call is not None:
+        budget = max(0.0, llm_deadline(req) - (time.monotonic() - started))
+        try:
+            picked, reps = await asyncio.wait_for(llm_call, timeout=budget)   # cancels it on timeout
+        except asyncio.TimeoutError:
+            fallback_reason = f"model missed the {llm_deadline(req):g}s budget"
+        else:
+            if picked:
+                chosen, reps_override, source = picked, reps, "llm"
+            else:
+                fallback_reason = "model call failed or picked nothing usable"
+    elif req.use_llm and llm is None:
+        fallback_reason = "no LLM client configured"
+    elif req.use_llm:
+        fallback_reason = "no shortlisted exercises for the model"
+
+    # Build response items
     plan_items: List[PlanExercise] = [
         PlanExercise(
             name=ex.name,
             description=ex.description,
             difficulty=ex.difficulty,
-            reps=reps_override.get(ex.name, ex.reps)
+            # AI prescription, else the dataset's, else one from the catalog's reps tiers
+            reps=reps_override.get(ex.name) or ex.reps or tier_prescription(ex)
         )
         for ex in chosen[: req.number_of_exercises]
     ]
 
-    # If AI selection was off, we can still let AI refine reps optionally
-    if req.use_llm and not reps_override:
-        llm_fill_reps(plan_items, req)
-
     return PlanResponse(
         plan=plan_items,
         focus_scores=make_focus_scores(chosen, targets),
-        notes=["Warm up 5–10 min", "Rest 60–90 s between sets", "Cool down & stretch"]
+        notes=["Warm up 5–10 min", "Rest 60–90 s between sets", "Cool down & stretch"],
+        source=source,
+        fallback_reason=fallback_reason,
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Mixed-traffic load test for /plan: slow use_llm requests alongside heuristic-only
+ones, against a local stand-in for the OpenAI API.
+
+  python load_test.py                                   # 64 LLM + 8 heuristic clients, 2 s LLM, 10 s
+  python load_test.py --llm-latency 30 --deadline 5     # LLM slower than the budget
+  python load_test.py --app-dir /some/other/checkout    # same load against another app.py
+
+Starts the stand-in server (answers chat completions after --llm-latency seconds
+with a valid structured plan), runs `uvicorn app:app` from --app-dir pointed at
+it, then keeps --llm-clients and --heuristic-clients requests in flight each
+for --duration seconds and reports throughput, latency and which plan (llm /
+heuristic) was served, per kind.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class StandInLLM(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 2.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        time.sleep(self.latency)
+        # pick the first few names the schema allows, so the plan always validates
+        schema = body["response_format"]["json_schema"]["schema"]
+        names = schema["properties"]["plan"]["items"]["properties"]["name"]["enum"]
+        plan = [{"name": nm, "prescription": "3×8–12", "block": "strength"} for nm in names[:6]]
+        data = json.dumps({
+            "id": "chatcmpl-standin", "object": "chat.completion", "created": 0, "model": "stand-in",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": json.dumps({"plan": plan})}}],
+        }).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # the caller gave up (deadline) and closed the connection
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60) -> None:
+    end = time.time() + timeout
+    while time.time() < end:
+        if proc.poll() is not None:
+            sys.exit(f"app exited with {proc.returncode}")
+        try:
+            httpx.get(url + "/openapi.json", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    sys.exit("app did not come up")
+
+
+async def client_loop(http: httpx.AsyncClient, url: str, body: dict, start: float, stop: float,
+                      out: List[float], errors: List[str], sources: Counter):
+    while time.perf_counter() < stop:
+        t0 = time.perf_counter()
+        try:
+            r = await http.post(url + "/plan", json=body)
+            r.raise_for_status()
+            if t0 >= start:   # requests sent during the warm-up aren't counted
+                out.append(time.perf_counter() - t0)
+                sources[r.json().get("source", "?")] += 1
+        except httpx.HTTPError as e:
+            if t0 >= start:
+                errors.append(type(e).__name__)
+
+
+def summary(name: str, lat: List[float], errors: List[str], sources: Counter, duration: float) -> Dict[str, float]:
+    if not lat:
+        print(f"  {name:<10} 0 done, {len(errors)} errors")
+        return {}
+    lat = sorted(lat)
+    p = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1e3
+    won = ", ".join(f"{k} {v}" for k, v in sources.most_common())
+    print(f"  {name:<10} {len(lat):6d} done  {len(lat) / duration:8.1f} req/s   "
+          f"p50 {p(0.50):8.1f} ms  p99 {p(0.99):8.1f} ms  max {lat[-1] * 1e3:8.1f} ms  errors {len(errors)}  [{won}]")
+    return {"n": len(lat), "p50": statistics.median(lat)}
+
+
+async def drive(url: str, args) -> None:
+    llm_body = {"target_muscles": ["Pectoralis Major", "Triceps Brachii"], "use_llm": True}
+    if args.deadline is not None:
+        llm_body["llm_deadline_seconds"] = args.deadline
+    heur_body = {"target_muscles": ["Latissimus Dorsi", "Biceps Brachii"], "use_llm": False}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=None) as http:
+        start = time.perf_counter() + args.warmup
+        stop = start + args.duration
+        llm_lat: List[float] = []
+        heur_lat: List[float] = []
+        llm_err: List[str] = []
+        heur_err: List[str] = []
+        llm_src: Counter = Counter()
+        heur_src: Counter = Counter()
+        await asyncio.gather(
+            *(client_loop(http, url, llm_body, start, stop, llm_lat, llm_err, llm_src) for _ in range(args.llm_clients)),
+            *(client_loop(http, url, heur_body, start, stop, heur_lat, heur_err, heur_src)
+              for _ in range(args.heuristic_clients)),
+        )
+        elapsed = time.perf_counter() - start
+    print(f"{args.llm_clients} LLM + {args.heuristic_clients} heuristic clients, "
+          f"LLM latency {args.llm_latency:g} s, {elapsed:.1f} s")
+    summary("llm", llm_lat, llm_err, llm_src, elapsed)
+    summary("heuristic", heur_lat, heur_err, heur_src, elapsed)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--app-dir", default=HERE, help="directory holding app.py")
+    ap.add_argument("--llm-clients", type=int, default=64)
+    ap.add_argument("--heuristic-clients", type=int, default=8)
+    ap.add_argument("--llm-latency", type=float, default=2.0, help="stand-in LLM response time (s)")
+    ap.add_argument("--deadline", type=float, default=None, help="llm_deadline_seconds (budget) to send")
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=3.0,
+                    help="seconds of traffic before measuring (first connections, lazy imports)")
+    args = ap.parse_args()
+
+    StandInLLM.latency = args.llm_latency
+    ThreadingHTTPServer.request_queue_size = 1024   # default listen backlog is 5
+    llm = ThreadingHTTPServer(("127.0.0.1", 0), StandInLLM)
+    llm.daemon_threads = True
+    threading.Thread(target=llm.serve_forever, daemon=True).start()
+
+    port = free_port()
+    env = dict(os.environ,
+               OPENAI_API_KEY="stand-in",
+               OPENAI_BASE_URL=f"http://127.0.0.1:{llm.server_address[1]}/v1")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=args.app_dir, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(url, proc)
+        asyncio.run(drive(url, args))
+    finally:
+        proc.terminate()
+        proc.wait()
+        llm.shutdown()
+
+
+if __name__ == "__main__":
+    main()